@@ -0,0 +1,104 @@
+"""Run the benchmark suite and print the results as JSON"""
+
+import argparse
+import json
+import sys
+from typing import List
+
+from benchmarks.bench import (bench_csv, bench_end_to_end, bench_render, environment,
+                              run_isolated)
+
+
+def int_list(value: str) -> List[int]:
+    """`"10,100"` -> `[10, 100]`"""
+    return [int(v) for v in value.split(',')]
+
+
+def parse_args():
+    """Read args and return object"""
+    parser = argparse.ArgumentParser(
+        description="Benchmark report rendering, csv storage and whole runs "
+        "on synthetic data. Every case runs in its own process."
+    )
+    parser.add_argument(
+        '--entries',
+        type=int_list,
+        default=[10, 100],
+        help="Raw file entries per section, comma separated (default: 10,100)"
+    )
+    parser.add_argument(
+        '--fenomenos',
+        type=int_list,
+        default=[3, 12],
+        help="Distinct phenomena in the raw file, comma separated (default: 3,12)"
+    )
+    parser.add_argument(
+        '--users',
+        type=int_list,
+        default=[1000, 50000],
+        help="Subscribers in the csv, comma separated (default: 1000,50000)"
+    )
+    parser.add_argument(
+        '--repeat',
+        type=int,
+        default=3,
+        help="Renders per raw file (default: 3)"
+    )
+    parser.add_argument(
+        '--lookups',
+        type=int,
+        default=100,
+        help="Searches per csv, of 10 phones each (default: 100)"
+    )
+    parser.add_argument(
+        '--upserts',
+        type=int,
+        default=20,
+        help="Upserts per csv (default: 20)"
+    )
+    parser.add_argument(
+        '--e2e-users',
+        type=int,
+        default=20,
+        help="Clients of the end-to-end run; 0 to skip it (default: 20)"
+    )
+    parser.add_argument(
+        '-j', '--jobs',
+        type=int,
+        default=1,
+        help="Rendering processes of the end-to-end run (default: 1)"
+    )
+    parser.add_argument(
+        '--stamp',
+        action='store_true',
+        help="Stamp client info on shared pages in the end-to-end run"
+    )
+    parser.add_argument(
+        '-o', '--output',
+        type=str,
+        help="Write the results to this file instead of stdout"
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    results = []
+    for entries in args.entries:
+        for fenomenos in args.fenomenos:
+            results.append(run_isolated(bench_render, entries, fenomenos, args.repeat))
+    for users in args.users:
+        results.append(run_isolated(bench_csv, users, args.lookups, args.upserts))
+    if args.e2e_users:
+        results.append(run_isolated(
+            bench_end_to_end, args.e2e_users, max(args.entries),
+            max(args.fenomenos), args.jobs, args.stamp))
+
+    report = {'environment': environment(), 'args': vars(args), 'results': results}
+    if args.output:
+        with open(args.output, 'w', encoding='utf8') as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
@@ -0,0 +1,184 @@
+"""
+bench.py
+
+Responsability:
+- time report rendering, csv storage and whole runs on synthetic data
+- run every case in a fresh process, so its peak RSS is its own
+"""
+
+import io
+import multiprocessing
+import os
+import platform
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from datetime import datetime
+from time import perf_counter
+from typing import Callable
+from unittest.mock import patch
+
+from PyPDF2 import PdfReader  # pylint: disable=E0401
+
+from benchmarks.generators import (sample_phones, user_line, user_phone,
+                                   write_raw_file, write_users_csv)
+from data_service.app import utils as data_utils
+from report_generator.app.report_args import ReportArgs  # pylint: disable=E0401,E0611
+from report_generator.app.report_generator import ReportGenerator  # pylint: disable=E0401,E0611
+from report_generator.app.report_pdf import ReportPdf  # pylint: disable=E0401,E0611
+
+try:
+    import resource
+except ImportError:  # Windows: no peak RSS
+    resource = None
+
+REPORT_DATE = datetime(2024, 2, 2, 10, 12)
+CSV_NAME = "data.csv"
+
+
+def run_isolated(case: Callable[..., dict], *args) -> dict:
+    """Run a case in a new (spawned) process and return its result"""
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(case, *args).result()
+
+
+def peak_rss_kb() -> int | None:
+    """Peak resident memory of this process so far, in KB (None if unknown)"""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def bench_render(entries: int, fenomenos: int, repeat: int) -> dict:
+    """
+    `ReportPdf.generate_pdf` pages per second
+
+    The first run also loads fonts and styles; it is timed apart.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        raw_path = write_raw_file(f"{temp_dir}/bruto.json", entries, fenomenos)
+        # read as the report_generator does (big files are streamed)
+        args = ReportArgs(True)
+        json_data = args._read_json_data(raw_path, "json")  # pylint: disable=W0212
+        filename = f"{temp_dir}/report.pdf"
+
+        seconds = []
+        with redirect_stdout(io.StringIO()):  # generate_pdf prints the file name
+            for _ in range(repeat):
+                start = perf_counter()
+                ReportPdf(json_data, "cliente", REPORT_DATE).generate_pdf(filename)
+                seconds.append(perf_counter() - start)
+        pages = len(PdfReader(filename).pages)
+
+    return {
+        'case': "render",
+        'entries': entries,
+        'fenomenos': fenomenos,
+        'pages': pages,
+        'runs': repeat,
+        'first_run_seconds': seconds[0],
+        'seconds': sum(seconds),
+        'pages_per_sec': pages * repeat / sum(seconds),
+        'peak_rss_kb': peak_rss_kb(),
+    }
+
+
+def bench_csv(users: int, lookups: int, upserts: int) -> dict:
+    """
+    `search_data` (full scan), `CsvIndex.search` and `upsert_csv` calls
+    per second, on a csv of `users` subscribers
+
+    Every lookup asks for 10 phones; half of the upserts are new emails.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir, \
+            patch.object(data_utils, "data_folder", temp_dir):
+        write_users_csv(f"{temp_dir}/{CSV_NAME}", users)
+        batches = [sample_phones(users, 10, seed) for seed in range(lookups)]
+
+        start = perf_counter()
+        for phones in batches:
+            data_utils.search_data(phones)
+        search_seconds = perf_counter() - start
+
+        index = data_utils.CsvIndex(CSV_NAME)
+        start = perf_counter()
+        index.search([user_phone(0)])
+        build_seconds = perf_counter() - start
+        start = perf_counter()
+        for phones in batches:
+            index.search(phones)
+        index_seconds = perf_counter() - start
+
+        start = perf_counter()
+        for i in range(upserts):
+            data_utils.upsert_csv(user_line(i % users if i % 2 else users + i), CSV_NAME)
+        upsert_seconds = perf_counter() - start
+
+    return {
+        'case': "csv",
+        'users': users,
+        'search_data': _throughput(lookups, search_seconds),
+        'index_build_seconds': build_seconds,
+        'index_search': _throughput(lookups, index_seconds),
+        'upsert_csv': _throughput(upserts, upsert_seconds),
+        'peak_rss_kb': peak_rss_kb(),
+    }
+
+
+def bench_end_to_end(users: int, entries: int, fenomenos: int, jobs: int,
+                     stamp: bool) -> dict:
+    """
+    From raw file and subscriber csv to PDFs on disk (no email)
+
+    Runs as `python -m report_generator` would, but without data_service
+    (users come from `search_data`): note that it clears and fills
+    `report_generator/generated`.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir, \
+            patch.object(data_utils, "data_folder", temp_dir):
+        raw_path = write_raw_file(f"{temp_dir}/bruto.json", entries, fenomenos)
+        write_users_csv(f"{temp_dir}/{CSV_NAME}", users)
+
+        start = perf_counter()
+        base = ReportArgs(True)
+        args = base.parse_job({
+            'telefone': ",".join(user_phone(i) for i in range(users)),
+            'data': REPORT_DATE.isoformat(),
+            'bruto': raw_path,
+        }, {})
+        args.users = data_utils.search_data(args.phones)
+        args.jobs, args.senders, args.stamp = jobs, 1, stamp
+        summary = ReportGenerator(True).run(args)
+        seconds = perf_counter() - start
+
+    return {
+        'case': "end_to_end",
+        'users': users,
+        'entries': entries,
+        'fenomenos': fenomenos,
+        'jobs': jobs,
+        'stamp': stamp,
+        'generated': summary['generated'],
+        'errors': len(summary['errors']),
+        'seconds': seconds,
+        'pdfs_per_sec': summary['generated'] / seconds,
+        'peak_rss_kb': peak_rss_kb(),
+    }
+
+
+def _throughput(calls: int, seconds: float) -> dict:
+    return {
+        'calls': calls,
+        'seconds': seconds,
+        'calls_per_sec': calls / seconds if seconds else None,
+    }
+
+
+def environment() -> dict:
+    """Where the results come from"""
+    return {
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+    }
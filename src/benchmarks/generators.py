@@ -0,0 +1,74 @@
+"""
+generators.py
+
+Responsability:
+- write synthetic "bruto" files and subscriber csvs, of any size
+"""
+
+import csv
+import json
+import random
+from datetime import datetime, timedelta
+from typing import List
+
+SECTIONS = ["análise", "previsao"]
+MESSAGE_WORDS = (
+    "chuva forte moderada vento rajadas trovoadas alagamentos temporários áreas baixas "
+    "período manhã tarde noite previsão indica intensidade atividades céu aberto "
+    "risco raios inundações trânsito vulneráveis autoridades moradores segurança"
+).split()
+
+
+def raw_data(entries: int, fenomenos: int, seed=0) -> dict:
+    """
+    Raw report data, as in `arquivo_bruto.json`
+
+    :param entries: entries per section
+    :param fenomenos: distinct `fenomeno` values, spread over the entries
+    """
+    rand = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    data = {}
+    for section in SECTIONS:
+        data[section] = [
+            {
+                'fenomeno': f"fenomeno {rand.randrange(fenomenos)}",
+                'data': (start + timedelta(hours=rand.randrange(24 * 30))).isoformat(
+                    timespec='minutes'),
+                'mensagem': " ".join(rand.choices(MESSAGE_WORDS, k=rand.randint(20, 60))),
+            }
+            for _ in range(entries)
+        ]
+    return data
+
+
+def write_raw_file(path: str, entries: int, fenomenos: int, seed=0) -> str:
+    """Write `raw_data` to `path`"""
+    with open(path, 'w', encoding='utf8') as file:
+        json.dump(raw_data(entries, fenomenos, seed), file, ensure_ascii=False, indent=4)
+    return path
+
+
+def user_line(i: int) -> str:
+    """Subscriber `i`, as a data_service `"nome,email,telefone,idade"` line"""
+    return f"cliente {i},cliente{i}@nimbusmeteorologia.com.br,{21900000000 + i},{18 + i % 60}"
+
+
+def user_phone(i: int) -> str:
+    """Phone of subscriber `i`"""
+    return str(21900000000 + i)
+
+
+def write_users_csv(path: str, users: int) -> str:
+    """Write a data_service csv with `users` subscribers"""
+    with open(path, 'w', newline='', encoding='utf8') as file:
+        writer = csv.writer(file)
+        writer.writerow(["nome", "email", "telefone", "idade"])
+        writer.writerows(user_line(i).split(',') for i in range(users))
+    return path
+
+
+def sample_phones(users: int, count: int, seed=0) -> List[str]:
+    """`count` phones of existing subscribers"""
+    rand = random.Random(seed)
+    return [user_phone(rand.randrange(users)) for _ in range(count)]
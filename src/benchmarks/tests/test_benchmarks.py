@@ -0,0 +1,65 @@
+"""Test benchmarks"""
+import json
+import os
+import tempfile
+import unittest
+
+from benchmarks import bench  # pylint: disable=E0401
+from benchmarks.bench import bench_csv, bench_render  # pylint: disable=E0401
+from benchmarks.generators import raw_data, write_users_csv  # pylint: disable=E0401
+from data_service.app.utils import CSV_HEADER  # pylint: disable=E0401
+
+
+class TestBenchmarks(unittest.TestCase):
+    """Test benchmarks"""
+
+    def test_raw_data(self):
+        """Raw data must have the requested size and phenomena"""
+        # act
+        data = raw_data(entries=40, fenomenos=3)
+
+        # assert
+        self.assertEqual(list(data), ["análise", "previsao"])
+        for entries in data.values():
+            self.assertEqual(len(entries), 40)
+            self.assertLessEqual(len({e['fenomeno'] for e in entries}), 3)
+        self.assertEqual(raw_data(40, 3), data)  # same seed, same data
+        json.dumps(data)
+
+    def test_users_csv(self):
+        """Users csv must have a header and one line per user"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # act
+            path = write_users_csv(f"{temp_dir}/data.csv", 5)
+
+            # assert
+            with open(path, 'r', encoding='utf8') as f:
+                lines = f.read().splitlines()
+            self.assertEqual(lines[0], CSV_HEADER)
+            self.assertEqual(len(lines), 6)
+
+    def test_cases(self):
+        """Cases must return their measures, leaving the data folder alone"""
+        # arrange
+        data_folder = f"{os.path.dirname(os.path.dirname(os.path.dirname(__file__)))}" \
+            "/data_service/data"
+        before = sorted(os.listdir(data_folder))
+
+        # act
+        render = bench_render(entries=2, fenomenos=1, repeat=1)
+        csv = bench_csv(users=50, lookups=2, upserts=2)
+
+        # assert
+        self.assertEqual(render['pages'], 2)
+        self.assertGreater(render['pages_per_sec'], 0)
+        if bench.resource is not None:
+            self.assertGreater(render['peak_rss_kb'], 0)
+        else:  # Windows
+            self.assertIsNone(render['peak_rss_kb'])
+        for key in ('search_data', 'index_search', 'upsert_csv'):
+            self.assertEqual(csv[key]['calls'], 2)
+        self.assertEqual(sorted(os.listdir(data_folder)), before)
+
+
+if __name__ == '__main__':
+    unittest.main()
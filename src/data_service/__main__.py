@@ -3,9 +3,16 @@
 import argparse
 import signal
 import threading
+from data_service.app.async_data_service import AsyncDataService
 from data_service.app.data_service import DataService
+from data_service.app.prefork import PreforkServer
 
-server = DataService()
+ENGINES = {
+    'sync': DataService,
+    'asyncio': AsyncDataService,
+}
+
+server: DataService = None
 
 
 def parse_args():
@@ -18,7 +25,42 @@ def parse_args():
         action='store_true',
         help="Enable stopping the server with Ctrl+C"
     )
-    return parser.parse_args()
+    parser.add_argument(
+        '-e', '--engine',
+        choices=ENGINES.keys(),
+        default='sync',
+        help="Server engine: 'sync' serves one connection at a time, "
+        "'asyncio' serves many connections at once"
+    )
+    parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        default=1,
+        help="Number of worker processes sharing the port (pre-fork, Linux). "
+        "Ctrl-C always stops all of them"
+    )
+    parser.add_argument(
+        '-s', '--storage',
+        choices=["csv", "sqlite"],
+        default='csv',
+        help="Storage backend: 'csv' (data.csv) or 'sqlite' (data.db)"
+    )
+    parser.add_argument(
+        '--append-only',
+        action='store_true',
+        help="Append upserts to the csv and compact it in background"
+    )
+    parser.add_argument(
+        '-m', '--metrics-port',
+        type=int,
+        default=None,
+        help="Also serve plain-text metrics on this port "
+        "(e.g. `curl 127.0.0.1:<port>`)"
+    )
+    parsed_args = parser.parse_args()
+    if parsed_args.append_only and parsed_args.storage != "csv":
+        parser.error("--append-only only works with --storage csv")
+    return parsed_args
 
 
 def signal_handler(sig, frame):  # pylint: disable=W0613
@@ -39,7 +81,19 @@ def run_detach():
 
 if __name__ == "__main__":
     args = parse_args()
-    if args.detach:
-        run_detach()
+
+    def create_server(metrics_port: int = None) -> DataService:
+        """Server with the selected engine and storage"""
+        return ENGINES[args.engine](
+            append_only=args.append_only, storage=args.storage,
+            metrics_port=metrics_port)
+
+    if args.workers > 1:
+        # the supervisor binds the metrics port for every worker
+        PreforkServer(args.workers, create_server, args.metrics_port).start_server()
     else:
-        server.start_server()
+        server = create_server(args.metrics_port)
+        if args.detach:
+            run_detach()
+        else:
+            server.start_server()
@@ -0,0 +1,179 @@
+"""async_data_service.py"""
+
+import asyncio
+import socket
+from typing import Iterator
+
+from data_service.app.data_service import DataService
+from data_service.app.handler import (
+    FRAMED_PREAMBLE, MAX_FRAME_SIZE, is_partial_preamble, iter_chunks, split_frames
+)
+
+
+class AsyncDataService(DataService):
+    """
+    Data service server on asyncio
+
+    Same requests as `DataService`, but connections are served
+    concurrently: a slow client no longer blocks the ones behind it.
+    Handler calls run in worker threads, so file I/O never blocks
+    the event loop; the repository serializes the writes.
+    """
+
+    BACKLOG = 128
+
+    _loop: asyncio.AbstractEventLoop = None
+    _stop_event: asyncio.Event
+    _writers: set
+
+    def start_server(self, server_socket: socket.socket = None,
+                     metrics_socket: socket.socket = None):
+        """
+        Start the server
+
+        :param server_socket: listening socket to serve from, instead of
+            binding a new one (e.g. inherited from a pre-fork supervisor)
+        :param metrics_socket: same, for the metrics port
+        """
+        self.is_running = True
+        self.host = '127.0.0.1'
+        self.port = 5784
+
+        self._start_metrics(metrics_socket)
+        try:
+            asyncio.run(self._serve(server_socket))
+        finally:
+            self._stop_metrics()
+
+    def request_stop(self):
+        """Stop serving (safe in signal handlers and from other threads)"""
+        self.is_running = False
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stop_event.set)
+
+    async def _serve(self, server_socket: socket.socket = None):
+        self._loop = asyncio.get_running_loop()
+        self._stop_event = asyncio.Event()
+        self._writers = set()
+        if server_socket is None:
+            server = await asyncio.start_server(
+                self._handle_connection, self.host, self.port,
+                reuse_address=True, backlog=self.BACKLOG)
+        else:
+            server = await asyncio.start_server(
+                self._handle_connection, sock=server_socket)
+        self.logger.info(
+            str(f"Server listening on {self.host}:{self.port} (asyncio)"))
+
+        async with server:
+            await self._stop_event.wait()
+            # persistent connections would keep the server open
+            for writer in list(self._writers):
+                writer.close()
+
+        self.is_running = False
+        self.handler.repository.close()
+        self.logger.info("Stopped.")
+
+    def _shutdown(self):
+        if self.shutdown_callback is not None:
+            self.shutdown_callback()
+        else:
+            self._stop_event.set()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader,
+                                 writer: asyncio.StreamWriter):
+        """Process request and send response/error"""
+        addr = writer.get_extra_info('peername')
+        data = await reader.read(self.handler.BUFFER_SIZE)
+        while is_partial_preamble(data):
+            chunk = await reader.read(self.handler.BUFFER_SIZE)
+            if not chunk:
+                break
+            data += chunk
+
+        # special requests
+
+        if data.strip() == b'_shutdown':
+            writer.close()
+            self._stop_event.set()
+            return
+
+        self.metrics.connection_opened()
+        try:
+            await self._serve_connection(reader, writer, addr, data)
+        finally:
+            self.metrics.connection_closed()
+
+    async def _serve_connection(self, reader: asyncio.StreamReader,
+                                writer: asyncio.StreamWriter, addr, data: bytes):
+        self.metrics.add_bytes(received=len(data))
+        if data.startswith(FRAMED_PREAMBLE):
+            self.logger.info("Framed connection from %s", addr)
+            self._writers.add(writer)
+            try:
+                await self._handle_framed_connection(
+                    reader, writer, data[len(FRAMED_PREAMBLE):])
+            finally:
+                self._writers.discard(writer)
+            return
+
+        data = data.decode('utf-8').strip()
+        self.logger.info("Connection from %s", addr)
+
+        if data == 'shutdown':
+            # no need for stop_server() to call us back
+            self.is_running = False
+
+        response = await asyncio.to_thread(self.handler.handle_data, data)
+        await self._write_chunks(writer, iter_chunks(response))
+        writer.close()
+        await writer.wait_closed()
+
+        if data == 'shutdown':
+            self._shutdown()
+
+    async def _handle_framed_connection(self, reader: asyncio.StreamReader,
+                                        writer: asyncio.StreamWriter,
+                                        buffer: bytes):
+        """Serve framed requests until the client disconnects"""
+        buffer = bytearray(buffer)
+        while True:
+            frames = split_frames(buffer)
+            if frames:
+                chunks, shutdown = self.handler.handle_frames(frames)
+                if shutdown:
+                    self.is_running = False
+                await self._write_chunks(writer, chunks)
+                if shutdown:
+                    self._shutdown()
+                    break
+
+            if len(buffer) > MAX_FRAME_SIZE:
+                writer.write(self.handler.ERR_FRAME_MSG + b"\n")
+                await writer.drain()
+                break
+
+            try:
+                chunk = await reader.read(self.handler.FRAMED_BUFFER_SIZE)
+            except ConnectionError:
+                break
+            if not self.handler.buffer_chunk(buffer, chunk):
+                break
+
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+    async def _write_chunks(self, writer: asyncio.StreamWriter,
+                            chunks: Iterator[bytes]):
+        """Send chunks as they are produced (in worker threads)"""
+        while True:
+            chunk = await asyncio.to_thread(next, chunks, None)
+            if chunk is None:
+                break
+            writer.write(chunk)
+            self.metrics.add_bytes(sent=len(chunk))
+            await writer.drain()
@@ -0,0 +1,129 @@
+"""
+client.py
+
+Responsability:
+- talk to data_service over one persistent, framed connection
+"""
+
+import json
+import socket
+from typing import Iterator, List
+
+from data_service.app.handler import FRAMED_PREAMBLE, split_frames
+
+
+class DataServiceClient:
+    """
+    Client for the framed data_service protocol
+
+    Example:
+        ```python
+        with DataServiceClient() as client:
+            client.post("joao,joao@nimbusmeteorologia.com.br,01234567891,21")
+            users = client.get(["01234567891"])
+        ```
+    """
+
+    BUFFER_SIZE = 64 * 1024
+
+    client: socket.socket = None
+
+    def __init__(self, host='127.0.0.1', port=5784, timeout: float = None):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._buffer = bytearray()
+        self._responses: List[bytes] = []
+
+    def __enter__(self):
+        self.connect()
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def connect(self):
+        """Open connection and switch it to framed mode"""
+        self.client = socket.create_connection(
+            (self.host, self.port), timeout=self.timeout)
+        self.client.sendall(FRAMED_PREAMBLE)
+
+    def close(self):
+        """Close connection"""
+        if self.client is not None:
+            self.client.close()
+            self.client = None
+        self._buffer.clear()
+        self._responses.clear()
+
+    def request(self, message: dict | str) -> str:
+        """Send one request and wait for its response"""
+        return self.pipeline([message])[0]
+
+    def pipeline(self, messages: List[dict | str]) -> List[str]:
+        """
+        Send all requests back to back, then read responses in order
+
+        Not for streaming requests, which answer with many lines.
+        """
+        self._send(messages)
+        return [self._read_response().decode() for _ in messages]
+
+    def get(self, phones: List[str]) -> List[dict]:
+        """Find users by phone"""
+        response = self.request({'command': "get", 'phone': phones})
+        if response.startswith("Error"):
+            raise ValueError(response)
+        return json.loads(response)['data']
+
+    def iter_get(self, phones: List[str]) -> Iterator[dict]:
+        """Find users by phone, reading them as the server streams them"""
+        self._send([{'command': "get", 'phone': phones, 'stream': True}])
+        while True:
+            response = self._read_response()
+            if response.startswith(b"Error"):
+                raise ValueError(response.decode())
+            user: dict = json.loads(response)
+            if user.get('end', False):
+                return
+            yield user
+
+    def post(self, data: str) -> str:
+        """Upsert one `"nome,email,telefone,idade"` line"""
+        return self.request({'command': "post", 'data': data})
+
+    def post_many(self, data: List[str]) -> dict:
+        """
+        Upsert many lines in a single storage write
+
+        :return: `{"saved": <count>, "errors": [{"row": <index>, "error": <message>}]}`
+        """
+        response = self.request({'command': "post_many", 'data': data})
+        if response.startswith("Error"):
+            raise ValueError(response)
+        return json.loads(response)
+
+    def stats(self) -> dict:
+        """Server metrics (see `Metrics.snapshot`)"""
+        response = self.request({'command': "stats"})
+        if response.startswith("Error"):
+            raise ValueError(response)
+        return json.loads(response)
+
+    def _send(self, messages: List[dict | str]):
+        if self.client is None:
+            self.connect()
+        frames = [
+            (m if isinstance(m, str) else json.dumps(m)).encode() + b"\n"
+            for m in messages
+        ]
+        self.client.sendall(b"".join(frames))
+
+    def _read_response(self) -> bytes:
+        while not self._responses:
+            chunk = self.client.recv(self.BUFFER_SIZE)
+            if not chunk:
+                raise ConnectionError("data_service closed the connection")
+            self._buffer += chunk
+            self._responses += split_frames(self._buffer)
+        return self._responses.pop(0)
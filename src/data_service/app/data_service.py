@@ -4,8 +4,11 @@ import logging
 import os
 import socket
 from time import sleep
+from typing import Callable
 
 from data_service.app.handler import Handler
+from data_service.app.metrics import Metrics, MetricsServer
+from data_service.app.repository import StorageType, create_repository
 from data_service.app.utils import get_logger
 
 app_folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -14,44 +17,93 @@ app_folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 class DataService:
     """Data service server"""
 
+    POLL_INTERVAL = 0.5
+
     server_socket: socket.socket = None
     is_running = False
     host: str
     port: int
     handler: Handler
-
-    def __init__(self, detach=False, test=False) -> None:
+    metrics: Metrics
+    metrics_server: MetricsServer = None
+    shutdown_callback: Callable[[], None] = None
+    """Called on a `shutdown` request instead of stopping this server"""
+
+    def __init__(self, detach=False, test=False, append_only=False,
+                 storage: StorageType = "csv", metrics_port: int = None) -> None:
+        """
+        :param metrics_port: serve plain-text metrics on this port too
+        """
         self.detach = detach
         self.debug = test
+        self.metrics_port = metrics_port
 
         # modules
-        self.handler = Handler(test)
+        repository = create_repository(storage, test, append_only)
+        self.metrics = Metrics()
+        self.handler = Handler(repository, test, self.metrics)
 
         self.logger = get_logger("DataService")
 
-    def start_server(self):
-        """Start the server"""
+    def start_server(self, server_socket: socket.socket = None,
+                     metrics_socket: socket.socket = None):
+        """
+        Start the server
+
+        :param server_socket: listening socket to serve from, instead of
+            binding a new one (e.g. inherited from a pre-fork supervisor)
+        :param metrics_socket: same, for the metrics port
+        """
         self.is_running = True
         self.host = '127.0.0.1'
         self.port = 5784
 
-        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.server_socket.bind((self.host, self.port))
-        self.server_socket.listen(5)
+        if server_socket is None:
+            server_socket = create_server_socket(self.host, self.port)
+        self.server_socket = server_socket
+        # wake up now and then to see if request_stop() was called
+        self.server_socket.settimeout(self.POLL_INTERVAL)
         self.logger.info(str(f"Server listening on {self.host}:{self.port}"))
+        self._start_metrics(metrics_socket)
 
         while self.is_running:
-            client_socket, addr = self.server_socket.accept()
+            try:
+                client_socket, addr = self.server_socket.accept()
+            except socket.timeout:
+                continue
             if not self.is_running:
+                client_socket.close()
                 break
             data = self.handler.handle_client(client_socket, addr)
 
             if data == 'shutdown':
-                self.stop_server()
+                (self.shutdown_callback or self.stop_server)()
             elif data == '_shutdown':
-                self.server_socket.close()
                 self.is_running = False
-                self.logger.info("Stopped.")
+
+        self.server_socket.close()
+        self.is_running = False
+        self._stop_metrics()
+        self.handler.repository.close()
+        self.logger.info("Stopped.")
+
+    def _start_metrics(self, metrics_socket: socket.socket = None):
+        if metrics_socket is None and self.metrics_port is None:
+            return
+        if metrics_socket is None:
+            metrics_socket = create_server_socket(self.host, self.metrics_port)
+        self.metrics_server = MetricsServer(
+            self.metrics, self.handler.repository.storage_size)
+        self.metrics_server.start(metrics_socket)
+
+    def _stop_metrics(self):
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+            self.metrics_server = None
+
+    def request_stop(self):
+        """Stop once the current request is done (safe in signal handlers)"""
+        self.is_running = False
 
     def stop_server(self):
         """Stop the server gracefully"""
@@ -64,6 +116,15 @@ class DataService:
             sleep(0.1)
 
 
+def create_server_socket(host: str, port: int, backlog=5) -> socket.socket:
+    """Bind and listen"""
+    server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server_socket.bind((host, port))
+    server_socket.listen(backlog)
+    return server_socket
+
+
 if __name__ == "__main__":
     server = DataService()
     server.start_server()
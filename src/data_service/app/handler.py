@@ -1,11 +1,60 @@
 """handler.py"""
-from ast import List
 import json
 import logging
 import re
 import socket
+from time import perf_counter
+from typing import Iterator, List
 
-from data_service.app.utils import get_logger, save_data, search_data
+from data_service.app.metrics import Metrics
+from data_service.app.repository import Repository
+from data_service.app.utils import get_logger
+
+FRAMED_PREAMBLE = b"ndjson\n"
+"""
+First bytes of a framed connection.
+
+After it, every request and every response is one line (newline-delimited),
+so a client can keep the connection open and pipeline many requests.
+Responses come back in request order.
+"""
+
+MAX_FRAME_SIZE = 16 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
+Response = bytes | Iterator[bytes]
+"""A whole response, or NDJSON lines produced on demand (streaming GET)"""
+
+
+def split_frames(buffer: bytearray) -> List[bytes]:
+    """Pop every complete line from buffer, leaving the incomplete tail"""
+    end = buffer.rfind(b"\n")
+    if end == -1:
+        return []
+    frames = bytes(buffer[:end]).split(b"\n")
+    del buffer[:end + 1]
+    return frames
+
+
+def is_partial_preamble(data: bytes) -> bool:
+    """Whether `data` is only the start of `FRAMED_PREAMBLE` (split over reads)"""
+    return 0 < len(data) < len(FRAMED_PREAMBLE) and FRAMED_PREAMBLE.startswith(data)
+
+
+def iter_chunks(response: Response, size=CHUNK_SIZE) -> Iterator[bytes]:
+    """Join a response into chunks of about `size` bytes, to send"""
+    if isinstance(response, bytes):
+        yield response
+        return
+
+    buffer = bytearray()
+    for part in response:
+        buffer += part
+        if len(buffer) >= size:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
 
 
 class Handler:
@@ -15,15 +64,26 @@ class Handler:
     Responsability:
     - Validate data
     - Process data (acts like a service)
-    - Read/Write socket messages
+    - Read/Write socket messages (one-shot and framed connections)
     """
 
     ERR_MSG = b"Error: Invalid data format"
+    ERR_FRAME_MSG = b"Error: Frame too large"
+    BUFFER_SIZE = 1024
+    FRAMED_BUFFER_SIZE = 64 * 1024
+    IDLE_TIMEOUT = 5.0
+    """Seconds a connection may stay silent before it is closed, so an idle
+    framed client can't hold the sync engine (one connection at a time)"""
+    ITEM_PATTERN = re.compile(r'^[\w\s]+,[\w\.-]+@[\w\.-]+,\d+,\d+$')
     test: bool
+    repository: Repository
+    metrics: Metrics
 
-    def __init__(self, test=False):
+    def __init__(self, repository: Repository, test=False, metrics: Metrics = None):
         self.test = test
         self.logger = get_logger("Handler")
+        self.repository = repository
+        self.metrics = metrics or Metrics()
 
     def handle_post(self, data: dict):
         """
@@ -37,18 +97,56 @@ class Handler:
         """
         # validate
         new_item: str = data.get('data', None)
-        pattern = r'^[\w\s]+,[\w\.-]+@[\w\.-]+,\d+,\d+$'
-        is_valid = True
-        if not isinstance(new_item, str) or not re.match(pattern, new_item):
-            is_valid = False
 
         # return
-        if not is_valid:
+        if not self._is_valid_item(new_item):
             return self.ERR_MSG
 
-        save_data(new_item, test=self.test)
+        self._save([new_item])
         return b"Ok"
 
+    def handle_post_many(self, data: dict):
+        """
+        Validate every item in one pass and save the valid ones
+        in a single write
+
+        Input:
+            (example)
+            ```json
+            { "command": "post_many", "data": [
+                "joao,joao@nimbusmeteorologia.com.br,01234567891,21",
+                "maria,maria@nimbusmeteorologia.com.br,01234567892,22"
+            ] }
+            ```
+
+        Response:
+            { "saved": 2, "errors": [{"row": <index>, "error": <message>}, ...] }
+        """
+        # validate
+        items: List[str] = data.get('data', None)
+        if not isinstance(items, list):
+            return self.ERR_MSG
+
+        valid_items = []
+        errors = []
+        for i, item in enumerate(items):
+            if self._is_valid_item(item):
+                valid_items.append(item)
+            else:
+                errors.append({"row": i, "error": "Invalid data format"})
+
+        # process
+        if valid_items:
+            self._save(valid_items)
+        return json.dumps({"saved": len(valid_items), "errors": errors}).encode()
+
+    def _is_valid_item(self, item: str) -> bool:
+        return isinstance(item, str) and bool(self.ITEM_PATTERN.match(item))
+
+    def _save(self, items: List[str]):
+        """Upsert items in a single storage write"""
+        self.repository.upsert_many(items)
+
     def handle_get(self, data: json):
         """
         Validate and parse GET data
@@ -60,6 +158,12 @@ class Handler:
 
         Response:
             { "data": [<user1>, <user2>, ...] }
+
+        With `"stream": true`, users are sent as they are found,
+        one JSON per line, followed by an end-of-stream marker:
+            <user1>
+            <user2>
+            { "end": true, "count": 2 }
         """
         # validate
         phones: List[str] = data.get('phone', None)
@@ -67,48 +171,187 @@ class Handler:
             return self.ERR_MSG
 
         # process
-        found = search_data(phones)
+        if data.get('stream', False):
+            return self._stream_get(phones)
+        found = self.repository.search(phones)
         return json.dumps({"data": found}).encode()
 
-    def handle_client(self, client_socket: socket.socket, addr: str):
-        """Process request and send response/error"""
-        buffer_size = 1024
-        data = client_socket.recv(buffer_size).decode('utf-8').strip()
+    def _stream_get(self, phones: List[str]) -> Iterator[bytes]:
+        count = 0
+        for user in self.repository.iter_search(phones):
+            count += 1
+            yield json.dumps(user).encode() + b"\n"
+        yield json.dumps({"end": True, "count": count}).encode() + b"\n"
 
-        # special requests
+    def handle_stats(self, _data: dict):
+        """
+        Service metrics
 
-        if data == '_shutdown':
-            client_socket.close()
-            return data
+        Input:
+        ```json
+        { "command": "stats" }
+        ```
 
-        self.logger.info(str(f"Connection from {addr}"))
+        Response: see `Metrics.snapshot`
+        """
+        return self.metrics.to_json(self.repository.storage_size())
 
+    def handle_data(self, data: str) -> Response:
+        """
+        Process one request message and return the response
+
+        Socket I/O is left to the server engine, so the same logic
+        serves the blocking and the asyncio servers.
+        """
+        start = perf_counter()
+        command, response = self._dispatch(data)
+        if isinstance(response, bytes):
+            self.metrics.record(command, perf_counter() - start,
+                                error=response.startswith(b"Error"))
+            return response
+        return self._timed(command, start, response)
+
+    def _timed(self, command: str, start: float, response: Iterator[bytes]):
+        """Record a streamed response once it is fully sent"""
+        yield from response
+        self.metrics.record(command, perf_counter() - start)
+
+    def _dispatch(self, data: str) -> tuple[str, Response]:
+        """:return: command name (for metrics) and response"""
         if data == 'shutdown':
-            client_socket.sendall(b"Shutting down server")
-            client_socket.close()
-            return data
+            return 'shutdown', b"Shutting down server"
 
         # JSON requests
 
         try:
             json_data: dict = json.loads(data)
         except json.JSONDecodeError:
-            client_socket.sendall(self.ERR_MSG)
-            return data
+            return 'parse_error', self.ERR_MSG
         except TypeError:
-            client_socket.sendall(self.ERR_MSG)
-            return data
+            return 'parse_error', self.ERR_MSG
+
+        if not isinstance(json_data, dict):
+            return 'parse_error', self.ERR_MSG
 
-        if json_data.get('command', None) == "post":
-            response = self.handle_post(json_data)
-            client_socket.sendall(response)
+        command = json_data.get('command', None)
+        if command in self.COMMANDS:
+            return command, self.COMMANDS[command](self, json_data)
 
-        elif json_data.get('command', None) == "get":
-            response = self.handle_get(json_data)
-            client_socket.sendall(response)
+        self.logger.error("Error: invalid call")
+        return 'invalid', b"Error: invalid call"
 
-        else:
-            self.logger.error("Error: invalid call")
-            client_socket.sendall(b"Error: invalid call")
+    COMMANDS = {
+        "post": handle_post,
+        "post_many": handle_post_many,
+        "get": handle_get,
+        "stats": handle_stats,
+    }
+
+    def handle_frames(self, frames: List[bytes]) -> tuple[Iterator[bytes], bool]:
+        """
+        Process framed requests in order
+
+        :return: response chunks (produced as they are consumed) and
+            whether a shutdown was requested
+        """
+        requests = []
+        for frame in frames:
+            data = frame.decode('utf-8', errors='replace').strip()
+            if not data:
+                continue
+            requests.append(data)
+            if data == 'shutdown':
+                return iter_chunks(self._iter_framed(requests)), True
+        return iter_chunks(self._iter_framed(requests)), False
+
+    def _iter_framed(self, requests: List[str]) -> Iterator[bytes]:
+        for data in requests:
+            response = self.handle_data(data)
+            if isinstance(response, bytes):
+                yield response + b"\n"
+            else:
+                yield from response
+
+    def handle_framed_client(self, client_socket: socket.socket, buffer: bytes):
+        """Serve framed requests until the client disconnects or stays idle"""
+        client_socket.settimeout(self.IDLE_TIMEOUT)
+        buffer = bytearray(buffer)
+        while True:
+            chunks, shutdown = self.handle_frames(split_frames(buffer))
+            for chunk in chunks:
+                client_socket.sendall(chunk)
+                self.metrics.add_bytes(sent=len(chunk))
+            if shutdown:
+                client_socket.close()
+                return 'shutdown'
+
+            if len(buffer) > MAX_FRAME_SIZE:
+                client_socket.sendall(self.ERR_FRAME_MSG + b"\n")
+                break
+
+            try:
+                chunk = client_socket.recv(self.FRAMED_BUFFER_SIZE)
+            except socket.timeout:
+                self.logger.info("Closing idle framed connection")
+                break
+            if not self.buffer_chunk(buffer, chunk):
+                break
 
         client_socket.close()
+        return None
+
+    def buffer_chunk(self, buffer: bytearray, chunk: bytes) -> bool:
+        """
+        Add a chunk read from a framed connection to its buffer
+
+        Shared by the server engines.
+        :return: False if the client disconnected (empty chunk)
+        """
+        if not chunk:
+            return False
+        self.metrics.add_bytes(received=len(chunk))
+        buffer += chunk
+        return True
+
+    def handle_client(self, client_socket: socket.socket, addr: str):
+        """Process request and send response/error"""
+        client_socket.settimeout(self.IDLE_TIMEOUT)
+        try:
+            data = client_socket.recv(self.BUFFER_SIZE)
+            while is_partial_preamble(data):
+                chunk = client_socket.recv(self.BUFFER_SIZE)
+                if not chunk:
+                    break
+                data += chunk
+        except socket.timeout:
+            client_socket.close()
+            return None
+
+        # special requests
+
+        if data.strip() == b'_shutdown':
+            client_socket.close()
+            return '_shutdown'
+
+        self.metrics.connection_opened()
+        try:
+            self.metrics.add_bytes(received=len(data))
+            if data.startswith(FRAMED_PREAMBLE):
+                self.logger.info("Framed connection from %s", addr)
+                return self.handle_framed_client(
+                    client_socket, data[len(FRAMED_PREAMBLE):])
+
+            data = data.decode('utf-8').strip()
+            self.logger.info("Connection from %s", addr)
+
+            response = self.handle_data(data)
+            for chunk in iter_chunks(response):
+                client_socket.sendall(chunk)
+                self.metrics.add_bytes(sent=len(chunk))
+            client_socket.close()
+            return data
+        except socket.timeout:  # client stopped reading
+            client_socket.close()
+            return None
+        finally:
+            self.metrics.connection_closed()
@@ -0,0 +1,193 @@
+"""
+metrics.py
+
+Responsability:
+- count requests, errors, bytes and connections
+- keep latency histograms per command
+- serve them as JSON (`stats` command) or plain text (metrics port)
+"""
+
+import json
+import os
+import socket
+import threading
+from time import monotonic
+from typing import Callable, Dict
+
+from data_service.app.utils import get_logger
+
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+"""Upper bounds in seconds; the last bucket (`+Inf`) catches the rest"""
+
+
+class Histogram:
+    """Cumulative latency histogram"""
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float):
+        """Add one sample"""
+        self.count += 1
+        self.sum += seconds
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                return
+        self.buckets[-1] += 1
+
+    def cumulative(self) -> Dict[str, int]:
+        """{upper bound: samples <= bound}"""
+        result = {}
+        total = 0
+        for bound, count in zip([*map(str, LATENCY_BUCKETS), "+Inf"], self.buckets):
+            total += count
+            result[bound] = total
+        return result
+
+
+# one attribute per metric, as `snapshot` reports them
+class Metrics:  # pylint: disable=R0902
+    """
+    Service metrics, shared by the server engine and `Handler`
+
+    Thread-safe: the asyncio engine records from worker threads.
+    """
+
+    def __init__(self):
+        self.started = monotonic()
+        self.requests: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self.latency: Dict[str, Histogram] = {}
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self.active_connections = 0
+        self._lock = threading.Lock()
+
+    def record(self, command: str, seconds: float, error=False):
+        """Count one request of `command` and its latency"""
+        with self._lock:
+            self.requests[command] = self.requests.get(command, 0) + 1
+            if error:
+                self.errors[command] = self.errors.get(command, 0) + 1
+            self.latency.setdefault(command, Histogram()).observe(seconds)
+
+    def add_bytes(self, received=0, sent=0):
+        """Count socket traffic"""
+        with self._lock:
+            self.bytes_received += received
+            self.bytes_sent += sent
+
+    def connection_opened(self):
+        """Count one more active connection"""
+        with self._lock:
+            self.active_connections += 1
+
+    def connection_closed(self):
+        """Count one less active connection"""
+        with self._lock:
+            self.active_connections -= 1
+
+    def snapshot(self, storage_size: int) -> dict:
+        """Every metric, as a JSON-ready dict"""
+        with self._lock:
+            return {
+                "pid": os.getpid(),
+                "uptime": round(monotonic() - self.started, 3),
+                "active_connections": self.active_connections,
+                "bytes_received": self.bytes_received,
+                "bytes_sent": self.bytes_sent,
+                "storage_size": storage_size,
+                "commands": {
+                    command: {
+                        "requests": count,
+                        "errors": self.errors.get(command, 0),
+                        "latency": {
+                            "count": self.latency[command].count,
+                            "sum": round(self.latency[command].sum, 6),
+                            "buckets": self.latency[command].cumulative(),
+                        },
+                    }
+                    for command, count in self.requests.items()
+                },
+            }
+
+    def to_text(self, storage_size: int) -> str:
+        """Every metric, one `name{labels} value` per line"""
+        stats = self.snapshot(storage_size)
+        pid = stats['pid']
+        lines = [
+            f'data_service_uptime_seconds{{pid="{pid}"}} {stats["uptime"]}',
+            f'data_service_active_connections{{pid="{pid}"}} {stats["active_connections"]}',
+            f'data_service_bytes_received_total{{pid="{pid}"}} {stats["bytes_received"]}',
+            f'data_service_bytes_sent_total{{pid="{pid}"}} {stats["bytes_sent"]}',
+            f'data_service_storage_bytes{{pid="{pid}"}} {stats["storage_size"]}',
+        ]
+        for command, values in stats['commands'].items():
+            labels = f'pid="{pid}",command="{command}"'
+            lines.append(f'data_service_requests_total{{{labels}}} {values["requests"]}')
+            lines.append(f'data_service_errors_total{{{labels}}} {values["errors"]}')
+            latency = values['latency']
+            for bound, count in latency['buckets'].items():
+                lines.append(
+                    f'data_service_request_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'data_service_request_seconds_sum{{{labels}}} {latency["sum"]}')
+            lines.append(f'data_service_request_seconds_count{{{labels}}} {latency["count"]}')
+        return "\n".join(lines) + "\n"
+
+    def to_json(self, storage_size: int) -> bytes:
+        """Response of the `stats` command"""
+        return json.dumps(self.snapshot(storage_size)).encode()
+
+
+class MetricsServer:
+    """
+    Plain-text metrics on a second port
+
+    Every connection gets the current dump (as an HTTP response, so
+    `curl 127.0.0.1:<port>` works) and is closed.
+    """
+
+    server_socket: socket.socket = None
+
+    def __init__(self, metrics: Metrics, storage_size: Callable[[], int]):
+        self.metrics = metrics
+        self.storage_size = storage_size
+        self.logger = get_logger("MetricsServer")
+
+    def start(self, server_socket: socket.socket):
+        """Serve from `server_socket` in a background thread"""
+        self.server_socket = server_socket
+        thread = threading.Thread(target=self._serve, name="metrics", daemon=True)
+        thread.start()
+
+    def stop(self):
+        """Close the socket (also wakes up the blocked accept)"""
+        try:
+            self.server_socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.server_socket.close()
+
+    def _serve(self):
+        host, port = self.server_socket.getsockname()
+        self.logger.info(str(f"Metrics on {host}:{port}"))
+        while True:
+            try:
+                client_socket, _ = self.server_socket.accept()
+            except OSError:
+                break  # closed
+            with client_socket:
+                # read (and ignore) the request, so closing doesn't reset it
+                client_socket.settimeout(1)
+                try:
+                    client_socket.recv(1024)
+                except OSError:
+                    pass
+                body = self.metrics.to_text(self.storage_size()).encode()
+                client_socket.sendall(
+                    b"HTTP/1.0 200 OK\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                    + f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
@@ -0,0 +1,137 @@
+"""prefork.py"""
+
+import os
+import signal
+import socket
+from time import monotonic, sleep
+from typing import Callable, Dict
+
+from data_service.app.data_service import DataService, create_server_socket
+from data_service.app.utils import get_logger, stop_logging
+
+
+# the listening attributes of DataService, plus the worker bookkeeping
+class PreforkServer:  # pylint: disable=R0902
+    """
+    Pre-fork supervisor
+
+    Binds the listening socket once and forks `workers` processes that
+    inherit it, so the kernel spreads connections over every core.
+
+    Responsability:
+    - fork workers (each builds its own server, storage included)
+    - restart workers that die
+    - stop every worker on SIGINT/SIGTERM or on a `shutdown` request
+
+    Workers share the storage files: csv writes are serialized with a
+    file lock and readers reload on change; SQLite handles it itself.
+    """
+
+    BACKLOG = 128
+    RESTART_DELAY = 1
+
+    server_socket: socket.socket = None
+    metrics_socket: socket.socket = None
+    is_running = False
+    host: str
+    port: int
+
+    def __init__(self, workers: int, server_factory: Callable[[], DataService],
+                 metrics_port: int = None):
+        """
+        :param server_factory: builds the server of each worker,
+            called after fork
+        :param metrics_port: shared by the workers; each answer carries
+            the metrics of the worker that accepted it (see `pid` label)
+        """
+        self.workers = workers
+        self.metrics_port = metrics_port
+        self.server_factory = server_factory
+        self._pids: Dict[int, float] = {}  # {pid: start time}
+        self.logger = get_logger("PreforkServer")
+
+    def start_server(self):
+        """Start workers and supervise them until stopped"""
+        self.is_running = True
+        self.host = '127.0.0.1'
+        self.port = 5784
+
+        self.server_socket = create_server_socket(
+            self.host, self.port, self.BACKLOG)
+        self.logger.info(str(
+            f"Server listening on {self.host}:{self.port} ({self.workers} workers)"))
+        if self.metrics_port is not None:
+            self.metrics_socket = create_server_socket(self.host, self.metrics_port)
+
+        signal.signal(signal.SIGINT, self._signal_handler)
+        signal.signal(signal.SIGTERM, self._signal_handler)
+        signal.signal(signal.SIGUSR1, self._signal_handler)
+
+        for _ in range(self.workers):
+            self._spawn()
+
+        while self._pids:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            started = self._pids.pop(pid, None)
+            if started is None or not self.is_running:
+                continue
+
+            self.logger.warning(str(
+                f"Worker {pid} died (status {status}), restarting"))
+            if monotonic() - started < self.RESTART_DELAY:
+                # crashing on startup: don't spin
+                sleep(self.RESTART_DELAY)
+            if self.is_running:
+                self._spawn()
+
+        self.server_socket.close()
+        if self.metrics_socket is not None:
+            self.metrics_socket.close()
+        self.is_running = False
+        self.logger.info("Stopped.")
+
+    def stop_server(self):
+        """Stop every worker once its current request is done"""
+        if not self.is_running:
+            return
+        self.logger.info("Stopping server...")
+        self.is_running = False
+        for pid in self._pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def _signal_handler(self, sig, frame):  # pylint: disable=W0613
+        self.stop_server()
+
+    def _spawn(self):
+        pid = os.fork()
+        if pid:
+            self._pids[pid] = monotonic()
+            return
+
+        # worker
+        status = 0
+        try:
+            self._run_worker()
+        except BaseException:  # pylint: disable=W0718
+            self.logger.exception("Worker failed")
+            status = 1
+        finally:
+            stop_logging()  # os._exit skips atexit
+            os._exit(status)  # pylint: disable=W0212
+
+    def _run_worker(self):
+        supervisor = os.getppid()
+        server = self.server_factory()
+        server.shutdown_callback = lambda: os.kill(supervisor, signal.SIGUSR1)
+
+        signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl-C goes to the supervisor
+        signal.signal(signal.SIGTERM, lambda *_: server.request_stop())
+        signal.signal(signal.SIGUSR1, signal.SIG_DFL)
+
+        server.start_server(self.server_socket, self.metrics_socket)
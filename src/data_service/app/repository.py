@@ -0,0 +1,203 @@
+"""
+repository.py
+
+Responsability:
+- storage backends behind a common interface (used by `Handler`)
+"""
+
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from typing import Iterator, List, Literal
+
+from data_service.app.utils import (
+    CsvIndex, CsvLog, data_folder, file_lock, get_csv_name, to_record,
+    upsert_csv_many
+)
+
+StorageType = Literal["csv", "sqlite"]
+"""
+Options:
+    :csv: `data.csv`, one line per user
+    :sqlite: `data.db`, unique email and indexed phone
+"""
+
+
+class Repository(ABC):
+    """
+    Storage interface
+
+    Items are `"nome,email,telefone,idade"` lines, already validated;
+    email is the unique key.
+    """
+
+    @abstractmethod
+    def upsert_many(self, data: List[str]):
+        """Upsert lines in a single write"""
+
+    @abstractmethod
+    def search(self, phone: List[str]) -> List[dict]:
+        """Find users by phone, in the order of `phone`"""
+
+    def iter_search(self, phone: List[str]) -> Iterator[dict]:
+        """Same as `search`, producing users as they are found"""
+        yield from self.search(phone)
+
+    def storage_size(self) -> int:
+        """Bytes used on disk"""
+        return 0
+
+    def close(self):
+        """Release resources"""
+
+
+class CsvRepository(Repository):
+    """
+    Csv storage
+
+    Reads come from a resident `CsvIndex`; writes either rewrite the csv
+    or, with `append_only`, go to a `CsvLog`.
+    """
+
+    def __init__(self, csv_name: str, append_only=False, read_csv_name: str = None):
+        """
+        :param read_csv_name: csv to search in, when not `csv_name`
+            (test servers write to a scratch csv but read the main one)
+        """
+        self.csv_name = csv_name
+        self.csv_path = f"{data_folder}/{csv_name}"
+        # reads may run concurrently, writes must not
+        self._write_lock = threading.Lock()
+        self.log = CsvLog(csv_name, self._write_lock) if append_only else None
+        self.index = CsvIndex(read_csv_name or csv_name, append_only)
+
+    def upsert_many(self, data: List[str]):
+        # pre-fork workers write the same file
+        with self._write_lock, file_lock(f"{self.csv_path}.lock"):
+            indexed = self.index.csv_name == self.csv_name
+            if indexed:
+                self.index.refresh()  # writes of other processes, before ours
+            if self.log is not None:
+                self.log.append_many(data)
+            else:
+                upsert_csv_many(data, self.csv_name)
+            if indexed:
+                self.index.upsert_many(data)
+
+    def search(self, phone: List[str]) -> List[dict]:
+        return self.index.search(phone)
+
+    def iter_search(self, phone: List[str]) -> Iterator[dict]:
+        return self.index.iter_search(phone)
+
+    def storage_size(self) -> int:
+        try:
+            return os.path.getsize(self.csv_path)
+        except FileNotFoundError:
+            return 0
+
+
+class SqliteRepository(Repository):
+    """
+    SQLite storage
+
+    WAL mode lets reads run while a write is in progress; every
+    `upsert_many` is one transaction.
+    """
+
+    _MAX_VARIABLES = 500
+
+    def __init__(self, db_name: str):
+        self.db_name = db_name
+        self.db_path = f"{data_folder}/{db_name}"
+        self._write_lock = threading.Lock()
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+
+        connection = self._get_connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        with connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS users ("
+                "nome TEXT NOT NULL, email TEXT PRIMARY KEY, "
+                "telefone TEXT NOT NULL, idade TEXT NOT NULL)")
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS users_telefone ON users (telefone)")
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """One connection per thread"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self.db_path, timeout=30, check_same_thread=False)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    def upsert_many(self, data: List[str]):
+        connection = self._get_connection()
+        with self._write_lock, connection:
+            connection.executemany(
+                "INSERT INTO users (nome, email, telefone, idade) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (email) DO UPDATE SET nome = excluded.nome, "
+                "telefone = excluded.telefone, idade = excluded.idade",
+                (item.split(',') for item in data))
+
+    def search(self, phone: List[str]) -> List[dict]:
+        return list(self.iter_search(phone))
+
+    def iter_search(self, phone: List[str]) -> Iterator[dict]:
+        if not phone:
+            return
+        phones = list(dict.fromkeys(phone))
+        connection = self._get_connection()
+
+        for i in range(0, len(phones), self._MAX_VARIABLES):
+            chunk = phones[i:i + self._MAX_VARIABLES]
+            rows = connection.execute(
+                "SELECT nome, email, telefone, idade FROM users "
+                f"WHERE telefone IN ({','.join('?' * len(chunk))}) ORDER BY rowid",
+                chunk).fetchall()
+            # {phone: [user]}
+            found: dict = {}
+            for row in rows:
+                found.setdefault(row[2], []).append(to_record(row))
+            for _phone in chunk:
+                yield from found.get(_phone, ())
+
+    def storage_size(self) -> int:
+        size = 0
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                size += os.path.getsize(self.db_path + suffix)
+            except FileNotFoundError:
+                pass
+        return size
+
+    def close(self):
+        with self._connections_lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+
+def get_db_name(test=False) -> str:
+    """Name of the SQLite database inside data folder"""
+    return "data.db" if not test else "$.test_data.db"
+
+
+def create_repository(storage: StorageType = "csv", test=False,
+                      append_only=False) -> Repository:
+    """Build the storage backend selected at startup"""
+    if storage == "sqlite":
+        return SqliteRepository(get_db_name(test))
+    if storage == "csv":
+        # GET always reads the main csv
+        return CsvRepository(get_csv_name(test), append_only,
+                             read_csv_name=get_csv_name())
+    raise ValueError(f"unknown storage {storage!r}")
@@ -5,11 +5,21 @@ Responsability:
 - save,find data (works like a repository)
 """
 
+import atexit
 import csv
+import io
 import logging
 import os
-import shutil
-from typing import List
+import queue
+import threading
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Iterator, List, TextIO
+
+try:
+    import fcntl
+except ImportError:  # Windows: no pre-fork workers, a single process writes
+    fcntl = None
 
 app_folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 data_folder = f"{app_folder}/data"
@@ -17,92 +27,440 @@ data_folder = f"{app_folder}/data"
 CSV_HEADER = "nome,email,telefone,idade"
 
 
+@contextmanager
+def file_lock(path: str):
+    """Exclusive lock shared by every process that writes the same file"""
+    if fcntl is None:
+        yield
+        return
+    with open(path, 'a', encoding='utf8') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def get_csv_name(test=False) -> str:
+    """Name of the csv file inside data folder"""
+    return "data.csv" if not test else "$.test_data.csv"
+
+
 def save_data(data, test=False):
     """Save data to csv. Create fie if not exists."""
-    csv_name = "data.csv" if not test else "$.test_data.csv"
+    csv_name = get_csv_name(test)
     upsert_csv(data, csv_name)
 
 
-def upsert_csv(data: str, csv_name: str):
-    """Upsert line with unique email"""
-    csv_file = f"{data_folder}/{csv_name}"
-    temp_file = f"{data_folder}/$.temp_data.csv"
-    email = data.split(',')[1]
+def save_many_data(data: List[str], test=False):
+    """Save many lines to csv in a single write. Create fie if not exists."""
+    csv_name = get_csv_name(test)
+    upsert_csv_many(data, csv_name)
 
-    # create csv with header
+
+def create_csv(csv_file: str):
+    """Create csv with header, if not exists"""
     if not os.path.exists(csv_file):
         with open(csv_file, 'a+', newline='', encoding='utf8') as write_file:
             writer = csv.writer(write_file)
             writer.writerow(CSV_HEADER.split(','))
 
+
+def upsert_csv(data: str, csv_name: str):
+    """Upsert line with unique email"""
+    upsert_csv_many([data], csv_name)
+
+
+def upsert_csv_many(data: List[str], csv_name: str):
+    """Upsert lines with unique email, rewriting the csv once"""
+    csv_file = f"{data_folder}/{csv_name}"
+    temp_file = f"{data_folder}/$.temp_data.csv"
+    # {email: row}, latest line per email wins
+    new_rows = {item.split(',')[1]: item.split(',') for item in data}
+
+    create_csv(csv_file)
+
     with (open(csv_file, 'r', newline='', encoding='utf8') as read_file,
           open(temp_file, 'w+', newline='', encoding='utf8') as write_file):
         reader = csv.reader(read_file)
         writer = csv.writer(write_file)
 
-        found = False
+        found = set()
         for row in reader:
-            if row[1] == email:
-                writer.writerow(data.split(','))
-                found = True
+            if row[1] in new_rows:
+                writer.writerow(new_rows[row[1]])
+                found.add(row[1])
             else:
                 writer.writerow(row)
 
-        if not found:
-            writer.writerow(data.split(','))
-    shutil.copy(temp_file, csv_file)
-    os.remove(csv_file)
-    os.rename(temp_file, csv_file)
+        writer.writerows(
+            row for email, row in new_rows.items() if email not in found)
+    # atomic: readers never see the csv missing or half written
+    os.replace(temp_file, csv_file)
+
+
+def append_csv(data: str, csv_name: str):
+    """Append line; on read, the latest line per email wins"""
+    append_csv_many([data], csv_name)
+
+
+def append_csv_many(data: List[str], csv_name: str):
+    """Append lines in a single write"""
+    csv_file = f"{data_folder}/{csv_name}"
+
+    create_csv(csv_file)
+
+    with open(csv_file, 'a', newline='', encoding='utf8') as write_file:
+        writer = csv.writer(write_file)
+        writer.writerows(item.split(',') for item in data)
+
+
+def compact_csv(csv_name: str):
+    """Keep only the latest line per email, replacing the csv atomically"""
+    csv_file = f"{data_folder}/{csv_name}"
+    temp_file = f"{data_folder}/$.compact_{csv_name}"
+    if not os.path.exists(csv_file):
+        return
+
+    header = CSV_HEADER.split(',')
+    rows: Dict[str, List[str]] = {}
+    with open(csv_file, 'r', newline='', encoding='utf8') as read_file:
+        for row in csv.reader(read_file):
+            if len(row) != len(header) or row == header:
+                continue
+            rows[row[1]] = row
+
+    with open(temp_file, 'w', newline='', encoding='utf8') as write_file:
+        writer = csv.writer(write_file)
+        writer.writerow(header)
+        writer.writerows(rows.values())
+        write_file.flush()
+        os.fsync(write_file.fileno())
+    os.replace(temp_file, csv_file)
+
+
+class CsvLog:
+    """
+    Append-only storage for a csv
+
+    Upserts are appended, so a write costs O(1) instead of a full rewrite;
+    readers keep the latest line per email. Once the file grows past
+    `COMPACT_GROWTH` times its last compacted size, a background thread
+    compacts it back to one line per email.
+    """
+
+    COMPACT_MIN_SIZE = 1024 * 1024
+    COMPACT_GROWTH = 2
+
+    csv_name: str
+
+    def __init__(self, csv_name: str, lock: threading.Lock):
+        """
+        :param lock: the lock that serializes writes to `csv_name`,
+            held by the compaction too
+        """
+        self.csv_name = csv_name
+        self.csv_path = f"{data_folder}/{csv_name}"
+        self._lock = lock
+        self._compacted_size = self._get_size()
+        self._compaction: threading.Thread = None
+
+    def append(self, data: str):
+        """Upsert line. Call with the write lock held"""
+        self.append_many([data])
+
+    def append_many(self, data: List[str]):
+        """Upsert lines in a single write. Call with the write lock held"""
+        append_csv_many(data, self.csv_name)
+
+        size = self._get_size()
+        threshold = max(self.COMPACT_MIN_SIZE,
+                        self.COMPACT_GROWTH * self._compacted_size)
+        compacting = self._compaction is not None and self._compaction.is_alive()
+        if size > threshold and not compacting:
+            self._compaction = threading.Thread(
+                target=self.compact, name=f"compact {self.csv_name}")
+            self._compaction.start()
+
+    def compact(self):
+        """Rewrite csv with one line per email"""
+        with self._lock, file_lock(f"{self.csv_path}.lock"):
+            compact_csv(self.csv_name)
+            self._compacted_size = self._get_size()
+
+    def _get_size(self) -> int:
+        try:
+            return os.path.getsize(self.csv_path)
+        except FileNotFoundError:
+            return 0
 
 
 def search_data(phone: List[str] = None, test=False):
-    """Search data in csv"""
+    """Search data in csv (full scan, see `CsvIndex` for the indexed lookup)"""
     if not phone:
         return []
 
-    csv_name = "data.csv" if not test else "$.test_data.csv"
+    csv_name = get_csv_name(test)
     csv_path = f"{data_folder}/{csv_name}"
     csv_file = csv.reader(open(csv_path, "r", encoding='utf8'), delimiter=",")
-    result: List[dict] = []
+    result: Dict[str, dict] = {}
     for row in csv_file:
-        _name, _email, _phone, _age = row
-        if _phone in phone:
-            result.append({
-                "name": _name,
-                "email": _email,
-                "phone": _phone,
-                "age": _age,
-            })
-    return result
+        if row[2] in phone:
+            # append-only files may repeat an email: latest line wins
+            result[row[1]] = to_record(row)
+    return list(result.values())
+
+
+def to_record(row: List[str]) -> dict:
+    """From csv row to user dict"""
+    _name, _email, _phone, _age = row
+    return {
+        "name": _name,
+        "email": _email,
+        "phone": _phone,
+        "age": _age,
+    }
+
+
+# index, indexed file state (stat, offset) and lock
+class CsvIndex:  # pylint: disable=R0902
+    """
+    Resident index of a csv: phone -> records
+
+    Built on first lookup and kept in memory, so a search costs
+    O(phones) instead of a full file scan.
+    Upserts done through this process are applied in place;
+    any other change to the file (inode/mtime/size) triggers a rebuild,
+    or, for `append_only` files that only grew, a read of the new lines.
+    """
+
+    csv_name: str
+    csv_path: str
+
+    def __init__(self, csv_name: str, append_only=False):
+        self.csv_name = csv_name
+        self.csv_path = f"{data_folder}/{csv_name}"
+        self.append_only = append_only
+        self._records: Dict[str, dict] = {}  # {email: record}
+        self._phones: Dict[str, Dict[str, None]] = {}  # {phone: {email}}
+        self._stat = None
+        self._offset = 0  # bytes of the file already indexed
+        self._lock = threading.Lock()
+
+    def search(self, phone: List[str]) -> List[dict]:
+        """Find records by phone, in the order of `phone`"""
+        if not phone:
+            return []
+        with self._lock:
+            self._refresh()
+            result: List[dict] = []
+            for _phone in dict.fromkeys(phone):
+                for email in self._phones.get(_phone, ()):
+                    result.append(self._records[email])
+            return result
+
+    def iter_search(self, phone: List[str]) -> Iterator[dict]:
+        """
+        Find records by phone, one at a time
+
+        The lock is held per phone only, so a slow consumer
+        never blocks writers.
+        """
+        if not phone:
+            return
+        for _phone in dict.fromkeys(phone):
+            with self._lock:
+                self._refresh()
+                records = [self._records[email]
+                           for email in self._phones.get(_phone, ())]
+            yield from records
+
+    def upsert(self, data: str):
+        """Apply a line just written by `upsert_csv`"""
+        self.upsert_many([data])
+
+    def upsert_many(self, data: List[str]):
+        """
+        Apply lines just written by `upsert_csv_many`
+
+        Call `refresh` before writing and this right after, both while
+        holding the file lock, so no other process wrote in between.
+        """
+        with self._lock:
+            if self._stat is None:  # never loaded: the file has everything
+                self._refresh()
+                return
+            for item in data:
+                self._add(item.split(','))
+            self._stat = self._get_stat()
+            self._offset = self._stat[2] if self._stat else 0
+
+    def refresh(self):
+        """Pick up changes made by someone else (see `upsert_many`)"""
+        with self._lock:
+            self._refresh()
+
+    def _add(self, row: List[str]):
+        record = to_record(row)
+        email = record['email']
+        old = self._records.get(email)
+        if old is not None and old['phone'] != record['phone']:
+            emails = self._phones[old['phone']]
+            del emails[email]
+            if not emails:
+                del self._phones[old['phone']]
+        self._records[email] = record
+        self._phones.setdefault(record['phone'], {})[email] = None
+
+    def _get_stat(self):
+        try:
+            stat = os.stat(self.csv_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _refresh(self):
+        """Rebuild when the file changed since last load"""
+        stat = self._get_stat()
+        if stat is None or stat == self._stat:
+            # a missing file keeps what was indexed (e.g. swapped by another writer)
+            return
+
+        try:
+            if (self.append_only and self._stat is not None
+                    and stat[0] == self._stat[0] and stat[2] > self._offset):
+                self._load_tail()
+                self._stat = stat
+                return
+            with open(self.csv_path, "r", newline='', encoding='utf8') as read_file:
+                self._load(read_file)
+        except FileNotFoundError:  # removed since stat
+            return
+        self._stat = stat
+        self._offset = stat[2]
+
+    def _load(self, read_file: TextIO):
+        """Index the whole file"""
+        self._records = {}
+        self._phones = {}
+        header = CSV_HEADER.split(',')
+        for row in csv.reader(read_file):
+            if len(row) != len(header) or row == header:
+                continue
+            self._add(row)
+
+    def _load_tail(self):
+        """Index complete lines appended since last load"""
+        with open(self.csv_path, "rb") as read_file:
+            read_file.seek(self._offset)
+            data = read_file.read()
+        end = data.rfind(b"\n") + 1
+        self._offset += end
+
+        text = io.StringIO(data[:end].decode('utf8'), newline='')
+        for row in csv.reader(text):
+            if len(row) == len(CSV_HEADER.split(',')):
+                self._add(row)
+
+
+LOG_LEVEL_ENV = "DATA_SERVICE_LOG_LEVEL"
+"""Environment variable with the default level (e.g. `INFO`), DEBUG if unset"""
+
+LOG_FILE = f"{app_folder}/log/data_service.log"
+
+# {(log_file, log_to_stream, format_file, format_stream): listener}
+_log_listeners: Dict[tuple, QueueListener] = {}
+_log_lock = threading.Lock()
+
+
+def _get_log_queue(key: tuple) -> queue.SimpleQueue:
+    """Queue drained by a background listener writing to the handlers in `key`"""
+    with _log_lock:
+        listener = _log_listeners.get(key)
+        if listener is None:
+            log_file, log_to_stream, format_file, format_stream = key
+            formatter = logging.Formatter(
+                '%(asctime)s [%(name)s] %(levelname)s - %(message)s')
+            handlers = []
+
+            if log_file:
+                os.makedirs(os.path.dirname(log_file), exist_ok=True)
+                file_handler = logging.FileHandler(log_file)
+                if format_file:
+                    file_handler.setFormatter(formatter)
+                handlers.append(file_handler)
+
+            if log_to_stream:
+                stream_handler = logging.StreamHandler()
+                if format_stream:
+                    stream_handler.setFormatter(formatter)
+                handlers.append(stream_handler)
+
+            listener = QueueListener(queue.SimpleQueue(), *handlers)
+            listener.start()
+            _log_listeners[key] = listener
+        return listener.queue
+
+
+def stop_logging():
+    """Write every queued record and stop the background listeners"""
+    with _log_lock:
+        for listener in _log_listeners.values():
+            listener.stop()
+        _log_listeners.clear()
+
+
+def _pause_logging():
+    """Drain the queues before fork: listener threads don't survive it"""
+    _log_lock.acquire()  # pylint: disable=R1732
+    for listener in _log_listeners.values():
+        listener.stop()
+
+
+def _resume_logging():
+    """Restart listeners after fork (parent and child)"""
+    for listener in _log_listeners.values():
+        listener.start()
+    _log_lock.release()
+
+
+atexit.register(stop_logging)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(before=_pause_logging,
+                        after_in_parent=_resume_logging,
+                        after_in_child=_resume_logging)
 
 
 def get_logger(
         name: str,
-        level=logging.DEBUG,
+        level: int | str = None,
         log_to_file=True,
         log_to_stream=True,
         format_file=True,
-        format_stream=True
+        format_stream=True,
+        log_file=LOG_FILE,
+        level_env=LOG_LEVEL_ENV
 ):
-    """Get logger with all needed configs"""
+    """
+    Get logger with all needed configs
+
+    Safe to call many times with the same name: handlers are only added
+    once. Records are queued and written by a background thread, so
+    logging never waits on the file or the terminal. Shared by
+    report_generator, which passes its own `log_file` and `level_env`.
+
+    :param level: defaults to `$DATA_SERVICE_LOG_LEVEL` (DEBUG if unset)
+    :param log_file: file written when `log_to_file`
+    :param level_env: environment variable with the default level
+    """
     logger = logging.getLogger(name)
-    logger.setLevel(level)
-    formatter = logging.Formatter(
-        '%(asctime)s [%(name)s] %(levelname)s - %(message)s')
-
-    if log_to_file:
-        file_handler = logging.FileHandler(
-            f'{app_folder}/log/data_service.log')
-        if format_file:
-            file_handler.setFormatter(formatter)
-        file_handler.setLevel(level)
-        logger.addHandler(file_handler)
-
-    if log_to_stream:
-        stream_handler = logging.StreamHandler()
-        if format_stream:
-            stream_handler.setFormatter(formatter)
-        stream_handler.setLevel(level)
-        logger.addHandler(stream_handler)
+    if level is not None:
+        logger.setLevel(level)
+    elif logger.level == logging.NOTSET:
+        logger.setLevel(os.environ.get(level_env, "DEBUG").upper())
+
+    if not any(isinstance(h, QueueHandler) for h in logger.handlers):
+        key = (log_file if log_to_file else None, log_to_stream, format_file, format_stream)
+        logger.addHandler(QueueHandler(_get_log_queue(key)))
 
     return logger
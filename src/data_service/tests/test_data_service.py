@@ -1,6 +1,7 @@
 """Test data_service.py"""
 import csv
 import json
+import logging
 import os
 import socket
 import threading
@@ -8,20 +9,31 @@ import unittest
 from time import sleep
 from unittest.mock import mock_open, patch
 
+from data_service.app.async_data_service import AsyncDataService
+from data_service.app.client import DataServiceClient
 from data_service.app.data_service import DataService
+from data_service.app.handler import FRAMED_PREAMBLE
+from data_service.app.repository import SqliteRepository, create_repository, get_db_name
+from data_service.app.utils import (
+    CsvIndex, CsvLog, get_csv_name, get_logger, save_data, search_data
+)
 
 
 app_folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 csv_file = f"{app_folder}/data/$.test_data.csv"
+db_file = f"{app_folder}/data/$.test_data.db"
 
 
 class TestDataService(unittest.TestCase):
     """Test data_service"""
 
+    server_class = DataService
+
     def setUp(self):
-        self.server = DataService(test=True)
+        self.server = self.server_class(test=True, metrics_port=5785)
         self.server_thread = threading.Thread(target=self.server.start_server)
         self.server_thread.start()
+        sleep(0.1)
 
         self.host = '127.0.0.1'
         self.port = 5784
@@ -109,6 +121,386 @@ class TestDataService(unittest.TestCase):
                 "age": "31",
             })
 
+    def _recv_lines(self, count: int) -> list:
+        """Read `count` framed responses"""
+        buffer = b""
+        while buffer.count(b"\n") < count:
+            chunk = self.client.recv(1024)
+            if not chunk:
+                break
+            buffer += chunk
+        return buffer.decode().split("\n")[:count]
+
+    def test_framed_pipeline(self):
+        """Framed connection must answer pipelined requests in order"""
+        # arrange
+        valid_data = 'joao,joao@nimbusmeteorologia.com.br,01234567891,30'
+        requests = [
+            json.dumps({'command': 'post', 'data': valid_data}),
+            json.dumps({'command': 'post', 'data': 'invalid'}),
+            json.dumps({'command': 'get', 'phone': ["01234567891"]}),
+        ]
+
+        # act
+        self.client.sendall(
+            FRAMED_PREAMBLE + "\n".join(requests).encode() + b"\n")
+        responses = self._recv_lines(3)
+
+        # assert
+        self.assertEqual(responses[0], 'Ok')
+        self.assertEqual(responses[1], 'Error: Invalid data format')
+        self.assertIn('data', json.loads(responses[2]))
+
+    def test_post_many(self):
+        """Bulk post must save valid rows and report invalid ones"""
+        # arrange
+        items = [f'user{i},user{i}@nimbusmeteorologia.com.br,0123456{i:04d},30'
+                 for i in range(100)]
+        items[10] = 'invalid,data'
+        items.append('user0,user0@nimbusmeteorologia.com.br,01234560000,99')
+
+        # act
+        self.client.sendall(FRAMED_PREAMBLE + json.dumps(
+            {'command': 'post_many', 'data': items}).encode() + b"\n")
+        response = json.loads(self._recv_lines(1)[0])
+
+        # assert
+        self.assertEqual(response['saved'], 100)
+        self.assertEqual(response['errors'], [
+            {'row': 10, 'error': 'Invalid data format'}])
+        with open(csv_file, 'r', encoding='utf8') as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(len(rows), 100)  # header + 99 unique emails
+        self.assertEqual(rows[1][3], '99')
+
+    @patch("builtins.open", new_callable=mock_open, read_data="nome,email,telefone,idade\n"
+           "joao,joao@nimbusmeteorologia2.com.br,01234567891,30\n"
+           "maria,maria@nimbusmeteorologia.com.br,01234567892,31\n"
+           "jose,jose@nimbusmeteorologia.com.br,01234567893,32"
+           )
+    def test_stream_get(self, _):
+        """Streaming GET must send one user per line and an end marker"""
+        # act
+        self.client.sendall(json.dumps({
+            'command': "get", 'phone': ["01234567891", "01234567893"], 'stream': True
+        }).encode())
+        lines = self._recv_lines(3)
+
+        # assert
+        users = [json.loads(line) for line in lines]
+        self.assertEqual([user['name'] for user in users[:2]], ['joao', 'jose'])
+        self.assertDictEqual(users[2], {'end': True, 'count': 2})
+
+    def test_stats_command(self):
+        """Stats must count requests and errors per command"""
+        # arrange
+        requests = [
+            {'command': 'post', 'data': 'joao,joao@nimbusmeteorologia.com.br,01234567891,21'},
+            {'command': 'post', 'data': 'invalid,data'},
+            {'command': 'stats'},
+        ]
+
+        # act
+        self.client.sendall(FRAMED_PREAMBLE + b"".join(
+            json.dumps(request).encode() + b"\n" for request in requests))
+        stats = json.loads(self._recv_lines(3)[2])
+
+        # assert
+        self.assertEqual(stats['commands']['post']['requests'], 2)
+        self.assertEqual(stats['commands']['post']['errors'], 1)
+        self.assertEqual(stats['commands']['post']['latency']['count'], 2)
+        self.assertEqual(stats['active_connections'], 1)
+        self.assertGreater(stats['storage_size'], 0)
+
+    def test_metrics_port(self):
+        """Metrics port must answer with the plain-text dump"""
+        # arrange
+        self.client.sendall(b'invalid data')
+        self.client.recv(1024)
+
+        # act
+        with socket.create_connection((self.host, 5785), timeout=5) as client:
+            client.sendall(b"GET /metrics HTTP/1.0\r\n\r\n")
+            response = b"".join(iter(lambda: client.recv(1024), b"")).decode()
+
+        # assert
+        self.assertTrue(response.startswith("HTTP/1.0 200 OK"))
+        self.assertIn('command="parse_error"', response)
+        self.assertRegex(response, r'data_service_errors_total\{[^}]*command="parse_error"\} 1')
+
+    def test_framed_large_request(self):
+        """Framed requests larger than one recv buffer must not be cut"""
+        # arrange
+        phones = [f"{i:011d}" for i in range(500)]
+
+        # act
+        self.client.sendall(FRAMED_PREAMBLE)
+        self.client.sendall(
+            json.dumps({'command': 'get', 'phone': phones}).encode() + b"\n")
+        response = self._recv_lines(1)[0]
+
+        # assert
+        self.assertIn('data', json.loads(response))
+
+    def test_split_preamble(self):
+        """Preamble split over reads must still open a framed connection"""
+        # act
+        self.client.sendall(FRAMED_PREAMBLE[:3])
+        sleep(0.05)
+        self.client.sendall(FRAMED_PREAMBLE[3:] + json.dumps(
+            {'command': 'get', 'phone': ["01234567891"]}).encode() + b"\n")
+        response = self._recv_lines(1)[0]
+
+        # assert
+        self.assertIn('data', json.loads(response))
+
+    def test_idle_framed_connection(self):
+        """An idle framed connection must not block other clients for long"""
+        # arrange
+        self.server.handler.IDLE_TIMEOUT = 0.2
+        self.client.sendall(FRAMED_PREAMBLE)
+
+        # act (self.client stays connected and silent)
+        with socket.create_connection((self.host, self.port), timeout=2) as other:
+            other.sendall(b'invalid,data')
+            response = other.recv(1024).decode()
+
+        # assert
+        self.assertEqual(response, 'Error: Invalid data format')
+
+
+class TestAsyncDataService(TestDataService):
+    """Test data_service with the asyncio engine"""
+
+    server_class = AsyncDataService
+
+    def test_concurrent_clients(self):
+        """An idle connection must not block other clients"""
+        # arrange
+        other = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        other.settimeout(2)
+        other.connect((self.host, self.port))
+
+        # act (self.client stays connected and silent)
+        other.sendall(b'invalid,data')
+        response = other.recv(1024).decode()
+        other.close()
+
+        # assert
+        self.assertEqual(response, 'Error: Invalid data format')
+
+    def test_client_persistent_connection(self):
+        """Client must reuse one connection for many requests"""
+        # arrange
+        valid_data = 'maria,maria@nimbusmeteorologia.com.br,01234567892,31'
+
+        # act
+        with DataServiceClient(timeout=2) as client:
+            post_response = client.post(valid_data)
+            responses = client.pipeline(
+                [{'command': 'get', 'phone': ["01234567892"]}] * 3)
+
+        # assert
+        self.assertEqual(post_response, 'Ok')
+        self.assertEqual(len(responses), 3)
+        self.assertEqual(len(set(responses)), 1)
+
+
+class TestCsvIndex(unittest.TestCase):
+    """Test CsvIndex"""
+
+    def setUp(self):
+        if os.path.exists(csv_file):
+            os.remove(csv_file)
+        save_data('joao,joao@nimbusmeteorologia.com.br,01234567891,30', test=True)
+        self.index = CsvIndex(get_csv_name(test=True))
+
+    def tearDown(self):
+        if os.path.exists(csv_file):
+            os.remove(csv_file)
+
+    def test_upsert_in_place(self):
+        """Upsert must move the record to its new phone"""
+        # act
+        self.index.search(["01234567891"])
+        new_item = 'joao,joao@nimbusmeteorologia.com.br,01234567899,31'
+        save_data(new_item, test=True)
+        self.index.upsert(new_item)
+
+        # assert (without reading the file again)
+        with patch("builtins.open", side_effect=AssertionError("index rebuilt")):
+            self.assertEqual(self.index.search(["01234567891"]), [])
+            found = self.index.search(["01234567899"])
+        self.assertEqual(len(found), 1)
+        self.assertEqual(found[0]['age'], '31')
+
+    def test_keep_index_without_file(self):
+        """A file missing for a moment (being replaced) must not empty the index"""
+        # arrange
+        self.index.search(["01234567891"])
+
+        # act
+        os.rename(csv_file, f"{csv_file}.moved")
+        try:
+            found = self.index.search(["01234567891"])
+        finally:
+            os.rename(f"{csv_file}.moved", csv_file)
+
+        # assert
+        self.assertEqual(len(found), 1)
+
+    def test_rebuild_on_file_change(self):
+        """Changes made by someone else must be picked up"""
+        # act
+        self.assertEqual(len(self.index.search(["01234567892"])), 0)
+        with open(csv_file, 'a', newline='', encoding='utf8') as f:
+            csv.writer(f).writerow(
+                ['maria', 'maria@nimbusmeteorologia.com.br', '01234567892', '31'])
+
+        # assert
+        self.assertEqual(len(self.index.search(["01234567892"])), 1)
+
+    def test_append_only_reads_new_lines(self):
+        """Lines appended by another process must be picked up"""
+        # arrange
+        index = CsvIndex(get_csv_name(test=True), append_only=True)
+        other = CsvLog(get_csv_name(test=True), threading.Lock())
+        self.assertEqual(len(index.search(["01234567891"])), 1)
+
+        # act
+        other.append('joao,joao@nimbusmeteorologia.com.br,01234567892,31')
+
+        # assert
+        self.assertEqual(index.search(["01234567891"]), [])
+        self.assertEqual(index.search(["01234567892"])[0]['age'], '31')
+
+
+class TestCsvLog(unittest.TestCase):
+    """Test CsvLog (append-only storage)"""
+
+    def setUp(self):
+        if os.path.exists(csv_file):
+            os.remove(csv_file)
+        self.lock = threading.Lock()
+        self.log = CsvLog(get_csv_name(test=True), self.lock)
+
+    def tearDown(self):
+        if os.path.exists(csv_file):
+            os.remove(csv_file)
+
+    def _read_rows(self):
+        with open(csv_file, 'r', encoding='utf8') as f:
+            return list(csv.reader(f))
+
+    def test_latest_line_wins(self):
+        """Upserts must be appended and the latest line read back"""
+        # act
+        self.log.append('joao,joao@nimbusmeteorologia.com.br,01234567891,30')
+        self.log.append('joao,joao@nimbusmeteorologia.com.br,01234567891,31')
+
+        # assert
+        self.assertEqual(len(self._read_rows()), 3)  # header + 2 lines
+        found = search_data(["01234567891"], test=True)
+        self.assertEqual(len(found), 1)
+        self.assertEqual(found[0]['age'], '31')
+
+    def test_compaction(self):
+        """Compaction must keep one line per email"""
+        # arrange
+        self.log.COMPACT_MIN_SIZE = 0
+        self.log.append('joao,joao@nimbusmeteorologia.com.br,01234567891,30')
+
+        # act
+        for age in range(40, 50):
+            with self.lock:
+                self.log.append(
+                    f'maria,maria@nimbusmeteorologia.com.br,01234567892,{age}')
+        self.log.compact()
+        self.log._compaction.join()  # pylint: disable=W0212
+
+        # assert
+        rows = self._read_rows()
+        self.assertEqual(len(rows), 3)  # header + joao + maria
+        self.assertEqual(rows[2][3], '49')
+
+
+class TestSqliteRepository(unittest.TestCase):
+    """Test SqliteRepository"""
+
+    def setUp(self):
+        self._remove_db()
+        self.repository = SqliteRepository(get_db_name(test=True))
+
+    def tearDown(self):
+        self.repository.close()
+        self._remove_db()
+
+    def _remove_db(self):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(db_file + suffix):
+                os.remove(db_file + suffix)
+
+    def test_unknown_storage(self):
+        """An unknown storage must be refused"""
+        # act / assert
+        with self.assertRaisesRegex(ValueError, "unknown storage 'mongo'"):
+            create_repository("mongo")
+
+    def test_upsert_unique_email(self):
+        """Upsert must keep one row per email"""
+        # act
+        self.repository.upsert_many([
+            'joao,joao@nimbusmeteorologia.com.br,01234567891,30',
+            'maria,maria@nimbusmeteorologia.com.br,01234567892,31',
+        ])
+        self.repository.upsert_many([
+            'joao,joao@nimbusmeteorologia.com.br,01234567893,32',
+        ])
+
+        # assert
+        self.assertEqual(self.repository.search(["01234567891"]), [])
+        found = self.repository.search(["01234567893", "01234567892"])
+        self.assertEqual([user['name'] for user in found], ['joao', 'maria'])
+        self.assertEqual(found[0]['age'], '32')
+
+    def test_reads_from_other_thread(self):
+        """Reads from other threads must see committed writes"""
+        # arrange
+        self.repository.upsert_many(
+            ['joao,joao@nimbusmeteorologia.com.br,01234567891,30'])
+        found = []
+
+        # act
+        thread = threading.Thread(
+            target=lambda: found.extend(self.repository.search(["01234567891"])))
+        thread.start()
+        thread.join()
+
+        # assert
+        self.assertEqual(len(found), 1)
+
+
+class TestGetLogger(unittest.TestCase):
+    """Test get_logger"""
+
+    def test_handlers_added_once(self):
+        """Repeated calls must not pile up handlers"""
+        # act
+        for _ in range(3):
+            logger = get_logger("TestGetLogger")
+
+        # assert
+        self.assertEqual(len(logger.handlers), 1)
+
+    def test_level_from_environment(self):
+        """Level must default to the environment variable"""
+        # act
+        with patch.dict(os.environ, {'DATA_SERVICE_LOG_LEVEL': 'warning'}):
+            logger = get_logger("TestGetLoggerLevel")
+
+        # assert
+        self.assertEqual(logger.level, logging.WARNING)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,8 +1,19 @@
 """Main script for data server"""
 
+import sys
+
+from report_generator.app.report_daemon import ReportDaemon  # pylint: disable=E0401,E0611
 from report_generator.app.report_generator import ReportGenerator  # pylint: disable=E0401,E0611
 
 if __name__ == "__main__":
     report = ReportGenerator()
     report.parse_args()
-    report.generate_pdf()
+    if report.args.daemon_port is not None:
+        ReportDaemon(report, port=report.args.daemon_port).start_server()
+        sys.exit(0)
+    summary = report.generate_pdf()
+    for error in summary['errors']:
+        job = f"job {error['job'] + 1}, " if report.args.manifest_jobs else ""
+        print(f"error: {error['email']} ({job}{error['stage']}): {error['error']}")
+    if summary['errors']:
+        sys.exit(1)
@@ -0,0 +1,113 @@
+"""
+columns.py
+
+Responsability:
+- turn a section's raw entries into columns, in one pass
+- give layout its rows grouped by `fenomeno` and sorted by date
+"""
+
+import re
+from array import array
+from datetime import datetime as dt
+from typing import Dict, Iterator, List, Tuple
+
+OTHERS = "Outros"
+"""`fenomeno` of entries without one; always the last group"""
+
+DATE_FORMAT = r"%d/%m/%Y às %H:%M"
+
+_EPOCH = dt(1970, 1, 1)
+_STRONG = re.compile("forte", re.IGNORECASE)
+
+Row = Tuple[str, str]
+"""(formatted date, message)"""
+
+
+class SectionColumns:
+    """
+    Entries of a section, column by column
+
+    Built in a single pass over the entries; dates are parsed and
+    formatted once per distinct value, and messages are searched for
+    "forte" without lowercasing copies.
+
+    Example:
+        ```python
+        for fenomeno, strong, rows in SectionColumns(entries).groups():
+            ...  # rows: [(date, message)], by date
+        ```
+    """
+
+    fenomenos: List[str]
+    """Name of each `fenomeno` code, in order of appearance"""
+    codes: array
+    """`fenomeno` code of each entry"""
+    timestamps: array
+    """Seconds since 1970-01-01 of each entry (UTC if the date has an offset,
+    as written otherwise)"""
+    strong: bytearray
+    """1 if the entry's message says "forte" (severity flag)"""
+    dates: List[str]
+    """Formatted date of each entry (`DATE_FORMAT`)"""
+    messages: List[str]
+
+    def __init__(self, entries: List[dict]):
+        self.fenomenos = []
+        self.codes = array('I')
+        self.timestamps = array('d')
+        self.strong = bytearray()
+        self.dates = []
+        self.messages = []
+
+        codes: Dict[str, int] = {}
+        parsed: Dict[str, tuple[float, str]] = {}  # {raw date: (timestamp, formatted)}
+        for entry in entries:
+            fenomeno: str = entry.get('fenomeno', OTHERS)
+            code = codes.get(fenomeno)
+            if code is None:
+                code = codes[fenomeno] = len(self.fenomenos)
+                self.fenomenos.append(fenomeno)
+
+            raw_date: str = entry['data']
+            date = parsed.get(raw_date)
+            if date is None:
+                value = dt.fromisoformat(raw_date)
+                # with an offset, the instant; otherwise as written
+                timestamp = (value.timestamp() if value.tzinfo is not None
+                             else (value - _EPOCH).total_seconds())
+                date = parsed[raw_date] = (timestamp, value.strftime(DATE_FORMAT))
+
+            message: str = entry['mensagem']
+            self.codes.append(code)
+            self.timestamps.append(date[0])
+            self.strong.append(_STRONG.search(message) is not None)
+            self.dates.append(date[1])
+            self.messages.append(message)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def order(self) -> List[int]:
+        """Entry indices grouped by `fenomeno` (in order of appearance,
+        `OTHERS` last), by date within a group"""
+        rank = array('I', range(len(self.fenomenos)))
+        if OTHERS in self.fenomenos:
+            rank[self.fenomenos.index(OTHERS)] = len(self.fenomenos)
+        codes, timestamps = self.codes, self.timestamps
+        # stable: same date keeps file order
+        return sorted(range(len(codes)), key=lambda i: (rank[codes[i]], timestamps[i]))
+
+    def groups(self) -> Iterator[tuple[str, bool, List[Row]]]:
+        """(fenomeno, whether any entry is "forte", rows) of each group"""
+        rows: List[Row] = []
+        code = None
+        strong = False
+        for i in self.order():
+            if self.codes[i] != code:
+                if rows:
+                    yield self.fenomenos[code], strong, rows
+                code, rows, strong = self.codes[i], [], False
+            rows.append((self.dates[i], self.messages[i]))
+            strong = strong or bool(self.strong[i])
+        if rows:
+            yield self.fenomenos[code], strong, rows
@@ -0,0 +1,97 @@
+"""
+mailer.py
+
+Responsability:
+- build the report email once per run
+- send it to every client over one persistent SMTP session
+"""
+
+import smtplib
+from datetime import datetime as dt
+from email.message import EmailMessage, MIMEPart
+
+from report_generator.app.utils import get_logger  # pylint: disable=E0401,E0611
+
+
+class ReportMailer:
+    """
+    Send report emails
+
+    The SMTP session is opened on the first email and reused; if the
+    server drops it, it is opened again and the email retried once.
+    Not thread-safe: use one mailer per sending thread.
+
+    Example:
+        ```python
+        with ReportMailer("localhost", 1025, "origem@exemplo.com") as mailer:
+            mailer.send("joao@nimbusmeteorologia.com.br", pdf_data)
+        ```
+    """
+
+    ATTACHMENT_NAME = 'relatorio_meteorologico.pdf'
+
+    smtp: smtplib.SMTP = None
+
+    def __init__(self, host: str, port: int, origin_email: str, timeout: float = 60):
+        self.host = host
+        self.port = port
+        self.origin_email = origin_email
+        self.timeout = timeout
+        self.logger = get_logger("ReportMailer")
+
+        # template
+        now = dt.now().strftime(r"%m/%d/%Y")
+        self.subject = f"Relatório Meteorológico - {now}"
+        self.body = MIMEPart()
+        self.body.add_alternative(f"""\
+        <html>
+        <body>
+            <h1>Relatório Meteorológico</h1>
+            <p>Segue em anexo o <b>relatório meteorológico</b> para a data de hoje ({now}).</p>
+            <p>Nimbus Tecnologia</p>
+        </body>
+        </html>
+        """, subtype='html')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def send(self, email: str, pdf_data: bytes):
+        """Send the report to one client"""
+        msg = self._build_message(email, pdf_data)
+        try:
+            self._get_smtp().send_message(msg)
+        except (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError) as exc:
+            # a rejected email (other SMTPException) leaves the session fine
+            self.logger.warning("SMTP session lost (%s), reconnecting", exc)
+            self.close()
+            self._get_smtp().send_message(msg)
+
+    def close(self):
+        """End the SMTP session"""
+        if self.smtp is None:
+            return
+        try:
+            self.smtp.quit()
+        except OSError:
+            self.smtp.close()
+        self.smtp = None
+
+    def _get_smtp(self) -> smtplib.SMTP:
+        if self.smtp is None:
+            self.smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        return self.smtp
+
+    def _build_message(self, email: str, pdf_data: bytes) -> EmailMessage:
+        msg = EmailMessage()
+        msg['Subject'] = self.subject
+        msg['From'] = self.origin_email
+        msg['To'] = [email]
+        msg.make_mixed()
+        msg.attach(self.body)
+        msg.add_attachment(pdf_data, maintype='application',
+                           subtype='pdf', filename=self.ATTACHMENT_NAME)
+        return msg
@@ -0,0 +1,127 @@
+"""
+pdf_cache.py
+
+Responsability:
+- keep rendered PDFs between runs, by content (raw data, client, date, template)
+- evict the least recently used ones past a size
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime as dt
+from typing import List
+
+from report_generator.app.raw_data import RawSections  # pylint: disable=E0401,E0611
+
+
+def raw_digest(json_data: dict | RawSections) -> str:
+    """Hash of the raw report data (of the file, when streamed)"""
+    if isinstance(json_data, RawSections):
+        with open(json_data.path, 'rb') as file:
+            return hashlib.file_digest(file, 'sha256').hexdigest()
+    data = json.dumps(json_data, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+class PdfCache:
+    """
+    Rendered PDFs, one file per content hash
+
+    Entries are written atomically, so worker processes can share the
+    folder; each one keeps an estimate of its size and, once past
+    `max_size`, evicts the least recently read entries.
+
+    Example:
+        ```python
+        cache = PdfCache("cache", 512 * 1024 * 1024)
+        key = cache.key(raw_digest(json_data), "joao", date, ReportPdf.TEMPLATE_VERSION)
+        if (data := cache.get(key)) is None:
+            data = ReportPdf(json_data, "joao", date).render()
+            cache.put(key, data)
+        ```
+    """
+
+    EVICT_TO = 0.9
+    """Fraction of `max_size` left after an eviction"""
+
+    def __init__(self, folder: str, max_size: int):
+        self.folder = folder
+        self.max_size = max_size
+        self._size: int = None  # estimate, see `_add_size`
+
+    def __getstate__(self):
+        # workers estimate the folder size themselves
+        return {**self.__dict__, '_size': None}
+
+    @staticmethod
+    def key(digest: str, client_name: str, report_date: dt, template_version: int) -> str:
+        """Cache key of one client's report"""
+        content = "\0".join([str(template_version), digest, client_name,
+                             report_date.isoformat()])
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def contains(self, key: str) -> bool:
+        """Whether the report is cached"""
+        return os.path.exists(self._path(key))
+
+    def get(self, key: str) -> bytes | None:
+        """Cached PDF, or None"""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+            os.utime(path)  # recently used
+        except FileNotFoundError:  # never cached, or just evicted
+            return None
+        return data
+
+    def put(self, key: str, data: bytes):
+        """Cache a PDF, then evict if past `max_size`"""
+        os.makedirs(self.folder, exist_ok=True)
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as file:
+            file.write(data)
+        os.replace(temp_path, path)
+        self._add_size(len(data))
+
+    def _add_size(self, size: int):
+        if self._size is None:
+            self._size = sum(entry_size for _, entry_size, _ in self._entries())
+        else:
+            self._size += size
+        if self._size > self.max_size:
+            self._evict()
+
+    def _evict(self):
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        self._size = sum(entry_size for _, entry_size, _ in entries)
+        for path, size, _ in entries:
+            if self._size <= self.max_size * self.EVICT_TO:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:  # evicted by another process
+                pass
+            self._size -= size
+
+    def _entries(self) -> List[tuple[str, int, float]]:
+        """(path, size, last use) of every entry"""
+        entries = []
+        try:
+            with os.scandir(self.folder) as scan:
+                for entry in scan:
+                    if not entry.name.endswith(".pdf"):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:  # evicted by another process
+                        continue
+                    entries.append((entry.path, stat.st_size, stat.st_mtime))
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def _path(self, key: str) -> str:
+        return f"{self.folder}/{key}.pdf"
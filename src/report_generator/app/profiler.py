@@ -0,0 +1,137 @@
+"""
+profiler.py
+
+Responsability:
+- time the stages of a run (wall and CPU), in total and per user
+- write the timing report and an optional cProfile dump
+"""
+
+import cProfile
+import json
+import threading
+from contextlib import contextmanager
+from datetime import datetime as dt
+from time import perf_counter, process_time, thread_time
+from typing import Dict, Iterator
+
+from report_generator.app.utils import get_logger  # pylint: disable=E0401,E0611
+
+Timings = Dict[str, tuple[float, float]]
+"""{stage: (wall seconds, CPU seconds)}, e.g. of one PDF in a worker process"""
+
+
+class Profiler:
+    """
+    Wall and CPU time per stage of a run
+
+    Stages: `fetch_users`, `parse_raw`, `body` (shared pages of `--stamp`)
+    and, per user, `build` (doc.build), `stamp`, `write` and `email`.
+    CPU time is the one of the thread running the stage; stages run by
+    worker processes come back as `Timings` (see `add_timings`), so with
+    `--jobs N` stage totals may add up to more than the run.
+
+    When disabled, `stage` records nothing.
+
+    Example:
+        ```python
+        profiler = Profiler(True, "log/profile.json")
+        with profiler.stage("write", user=(0, "joao@nimbusmeteorologia.com.br")):
+            ...
+        profiler.finish()
+        ```
+    """
+
+    def __init__(self, enabled=False, report_path: str = None, cprofile_path: str = None):
+        """
+        :param report_path: write the JSON timing report there on `finish`
+        :param cprofile_path: also profile calls of this process (not of
+            worker processes) and dump them there, see `pstats`
+        """
+        self.enabled = enabled
+        self.report_path = report_path
+        self.cprofile_path = cprofile_path
+        self.logger = get_logger("Profiler")
+        self._lock = threading.Lock()
+        self._stages: Dict[str, dict] = {}
+        self._users: Dict[tuple, Dict[str, dict]] = {}  # {(job, email): {stage: timing}}
+        self._start = (perf_counter(), process_time())
+        self._cprofile: cProfile.Profile = None
+        if enabled and cprofile_path:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+    @contextmanager
+    def stage(self, name: str, user: tuple = None) -> Iterator[None]:
+        """
+        Time the block as stage `name`
+
+        :param user: `(job index, email)` of the stage, if any
+        """
+        if not self.enabled:
+            yield
+            return
+        wall, cpu = perf_counter(), thread_time()
+        try:
+            yield
+        finally:
+            self.add(name, perf_counter() - wall, thread_time() - cpu, user)
+
+    def timings(self) -> Timings:
+        """Stage totals, to send back from a worker process"""
+        with self._lock:
+            return {name: (s['wall'], s['cpu']) for name, s in self._stages.items()}
+
+    def add_timings(self, timings: Timings, user: tuple = None):
+        """Record stages timed elsewhere (see `timings`)"""
+        for name, (wall, cpu) in timings.items():
+            self.add(name, wall, cpu, user)
+
+    def add(self, name: str, wall: float, cpu: float, user: tuple = None):
+        """Record one run of a stage"""
+        if not self.enabled:
+            return
+        with self._lock:
+            total = self._stages.setdefault(name, {'calls': 0, 'wall': 0.0, 'cpu': 0.0})
+            total['calls'] += 1
+            total['wall'] += wall
+            total['cpu'] += cpu
+            if user is not None:
+                stages = self._users.setdefault(user, {})
+                timing = stages.setdefault(name, {'wall': 0.0, 'cpu': 0.0})
+                timing['wall'] += wall
+                timing['cpu'] += cpu
+
+    def report(self) -> dict:
+        """
+        :return: `{"wall": <run seconds>, "cpu": <CPU seconds of this process>,
+            "stages": {<stage>: {"calls", "wall", "cpu"}},
+            "users": [{"job", "email", "stages": {<stage>: {"wall", "cpu"}}}]}`
+        """
+        with self._lock:
+            return {
+                'date': dt.now().isoformat(timespec='seconds'),
+                'wall': perf_counter() - self._start[0],
+                'cpu': process_time() - self._start[1],
+                'stages': {name: dict(s) for name, s in self._stages.items()},
+                'users': [
+                    {'job': job, 'email': email,
+                     'stages': {name: dict(t) for name, t in stages.items()}}
+                    for (job, email), stages in self._users.items()
+                ],
+            }
+
+    def finish(self) -> dict | None:
+        """End the run: write the timing report and the cProfile dump"""
+        if not self.enabled:
+            return None
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            self._cprofile.dump_stats(self.cprofile_path)
+            self.logger.info("cProfile dump saved to %s", self.cprofile_path)
+            self._cprofile = None
+        report = self.report()
+        if self.report_path:
+            with open(self.report_path, 'w', encoding='utf8') as file:
+                json.dump(report, file, indent=2)
+            self.logger.info("Timing report saved to %s", self.report_path)
+        return report
@@ -0,0 +1,132 @@
+"""
+raw_data.py
+
+Responsability:
+- read "bruto" files incrementally, one section at a time
+"""
+
+import json
+import re
+from typing import Iterator, List, TextIO, Tuple
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class RawSections:
+    """
+    Sections of a raw file, read again on every `items()`
+
+    Stands in for the parsed dict (`{section: [entry]}`) when the file
+    is too big to keep in memory: only the section being consumed is.
+    Pickles as its path, so worker processes read the file themselves.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def items(self) -> Iterator[Tuple[str, List[dict]]]:
+        """(section, entries) in file order"""
+        return iter_raw_sections(self.path)
+
+    def __repr__(self):
+        return f"RawSections({self.path!r})"
+
+
+def iter_raw_sections(path: str) -> Iterator[Tuple[str, List[dict]]]:
+    """
+    Read a raw file section by section
+
+    The file is a JSON object of sections; entries are decoded one by
+    one from a chunked buffer, so a section is yielded as soon as it is
+    read and the next one is not read before it is consumed.
+    """
+    with open(path, "r", encoding="utf8") as file:
+        stream = _JsonStream(file)
+        stream.expect("{")
+        if stream.peek() == "}":
+            return
+        while True:
+            key = stream.value()
+            stream.expect(":")
+            if stream.peek() == "[":
+                stream.expect("[")
+                entries = []
+                if stream.peek() == "]":
+                    stream.expect("]")
+                else:
+                    while True:
+                        entries.append(stream.value())
+                        if stream.expect(",]") == "]":
+                            break
+            else:
+                entries = stream.value()
+            yield key, entries
+            if stream.expect(",}") == "}":
+                return
+
+
+def check_raw_file(path: str):
+    """Raise `ValueError` if the file doesn't hold a JSON object"""
+    with open(path, "r", encoding="utf8") as file:
+        if _JsonStream(file).peek() != "{":
+            raise ValueError(f"{path} is not a JSON object")
+
+
+class _JsonStream:
+    """JSON tokens and values from a text file, read in chunks"""
+
+    _NON_BLANK = re.compile(r"[^ \t\n\r]")
+
+    def __init__(self, file: TextIO):
+        self.file = file
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _read(self) -> bool:
+        """Append a chunk to the buffer (dropping what was consumed)"""
+        if self.eof:
+            return False
+        chunk = self.file.read(CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-blank character ("" at end of file)"""
+        while True:
+            match = self._NON_BLANK.search(self.buffer, self.pos)
+            if match:
+                self.pos = match.start()
+                return self.buffer[self.pos]
+            self.pos = len(self.buffer)
+            if not self._read():
+                return ""
+
+    def expect(self, chars: str) -> str:
+        """Consume the next character, which must be one of `chars`"""
+        char = self.peek()
+        if not char or char not in chars:
+            raise json.JSONDecodeError(
+                f"Expecting one of {chars!r}", self.buffer, self.pos)
+        self.pos += 1
+        return char
+
+    def value(self):
+        """Decode the next JSON value"""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self._read():
+                    continue
+                raise
+            if end == len(self.buffer) and self._read():
+                continue  # a number may go on in the next chunk
+            self.pos = end
+            return value
@@ -7,12 +7,14 @@ import json
 import logging
 import os
 import re
-import socket
-from typing import List, Literal
+from typing import Dict, List, Literal
 from xml.dom import NotFoundErr
 from dateutil import parser as date_parser
 import yaml
 
+from report_generator.app.profiler import Profiler
+from report_generator.app.raw_data import RawSections, check_raw_file
+from report_generator.app.user_fetcher import UserFetcher
 from report_generator.app.utils import get_logger
 
 app_folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -41,14 +43,27 @@ class ReportArgs:
     _JSON_DATA_FORMATS = ["json", "jsonc", "json5"]
 
     CONFIG_FILE = f"{THIS_FOLDER}/app/report_generator.yaml"
+    STREAM_MIN_SIZE = 32 * 1024 * 1024
+    """Raw files from this size on are not loaded whole (see `RawSections`)"""
 
     # args
     phones: List[str]
     users: List[dict]
     date: datetime
     send_email: bool
+    jobs: int
+    senders: int
+    stamp: bool
     raw_path: str
-    json_data: dict
+    json_data: dict | RawSections
+    raw_key: tuple = None
+    """(real path, modification time) of the raw data, see `parse_job`"""
+    manifest_jobs: List["ReportArgs"] = None
+    daemon_port: int = None
+    cache_size: int = 0
+    """Bytes of rendered PDFs kept between runs (0: no cache)"""
+    profiler: Profiler
+    """Disabled unless `--profile` or `--cprofile`"""
     # constants
     config: dict
     origin_email: str
@@ -57,8 +72,8 @@ class ReportArgs:
         self._verbose = verbose
         self.host = '127.0.0.1'
         self.port = 5784
-        self.client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.logger = get_logger("ReportArgs")
+        self.profiler = Profiler()
 
     def parse_args(self) -> Exception | None:
         """
@@ -103,6 +118,7 @@ class ReportArgs:
             'TELEFONE',
             type=str,
             action='store',
+            nargs='?',
             help="Um ou mais números de telefone separados por vírgula" +
             "(Exemplo: 01234567891,78945612348)",
         )
@@ -110,6 +126,7 @@ class ReportArgs:
         parser.add_argument(
             'DATA',
             type=str,
+            nargs='?',
             help="Data no formato ISO 8601 (Exemplo: 2024-01-01T00:00)",
         )
 
@@ -117,7 +134,24 @@ class ReportArgs:
             '--bruto',
             type=str,
             help="Caminho para o conteúdo bruto do relatório (Exemplo: /tmp/bruto.txt)",
-            required=True,
+        )
+
+        parser.add_argument(
+            '--manifest',
+            type=str,
+            help="Arquivo JSONL com um relatório por linha, no lugar de TELEFONE, DATA "
+            "e --bruto (Exemplo: {\"telefone\": \"01234567891\", \"data\": "
+            "\"2024-01-01T00:00\", \"bruto\": \"/tmp/bruto.json\", \"envia_email\": true})",
+        )
+
+        parser.add_argument(
+            '--daemon',
+            type=int,
+            nargs='?',
+            const=5786,
+            metavar='PORTA',
+            help="Fica em execução recebendo relatórios pela porta local "
+            "(padrão: 5786), no lugar de TELEFONE, DATA e --bruto",
         )
 
         parser.add_argument(
@@ -127,6 +161,53 @@ class ReportArgs:
             default=False,
         )
 
+        parser.add_argument(
+            '-j', '--jobs',
+            type=int,
+            help="Número de processos gerando PDFs em paralelo",
+            default=1,
+        )
+
+        parser.add_argument(
+            '--senders',
+            type=int,
+            help="Número de conexões SMTP enviando e-mails em paralelo",
+            default=1,
+        )
+
+        parser.add_argument(
+            '--stamp',
+            action='store_true',
+            help="Monta as páginas uma única vez e só carimba o cabeçalho de cada cliente",
+            default=False,
+        )
+
+        parser.add_argument(
+            '--cache-size',
+            type=int,
+            help="MB de PDFs guardados entre execuções, para não gerar de novo relatórios "
+            "iguais (mesmo bruto, cliente e data); 0 desativa (padrão: 512)",
+            default=512,
+        )
+
+        parser.add_argument(
+            '--profile',
+            type=str,
+            nargs='?',
+            const=f"{THIS_FOLDER}/log/profile.json",
+            metavar='ARQUIVO',
+            help="Mede tempo (total e de CPU) de cada etapa e de cada cliente e salva "
+            "o relatório em JSON (padrão: log/profile.json)",
+        )
+
+        parser.add_argument(
+            '--cprofile',
+            type=str,
+            metavar='ARQUIVO',
+            help="Salva um dump do cProfile deste processo (os processos de --jobs "
+            "não entram; use --jobs 1 para ver a renderização)",
+        )
+
         parser.add_argument(
             '-v', '--verbose',
             action='store_true',
@@ -139,6 +220,13 @@ class ReportArgs:
         if self._verbose is None:
             self._verbose = args.verbose
 
+        if args.manifest is None and args.daemon is None:
+            missing = [name for name, value in (
+                ('TELEFONE', args.TELEFONE), ('DATA', args.DATA), ('--bruto', args.bruto))
+                if value is None]
+            if missing:
+                parser.error(f"os seguintes argumentos são obrigatórios: {', '.join(missing)}")
+
         return args
 
     def _load_config(self):
@@ -154,10 +242,103 @@ class ReportArgs:
 
     def _store_args(self, args: argparse.Namespace):
         """Save each arg into variables"""
+        if args.cprofile is not None and args.daemon is not None:
+            # jobs run in connection threads, out of cProfile's reach
+            raise argparse.ArgumentTypeError(
+                "parâmetro --cprofile não pode ser usado com --daemon")
+        if args.profile is not None or args.cprofile is not None:
+            self.profiler = Profiler(True, args.profile, args.cprofile)
+        self.jobs: int = self._parse_arg_count("--jobs", args.jobs)
+        self.senders: int = self._parse_arg_count("--senders", args.senders)
+        self.stamp: bool = args.stamp
+        if args.cache_size < 0:
+            raise argparse.ArgumentTypeError("parâmetro --cache-size não pode ser negativo")
+        self.cache_size = args.cache_size * 1024 * 1024
+        self.daemon_port: int | None = args.daemon
+        if self.daemon_port is not None:
+            # jobs come later, see `ReportDaemon`
+            self.send_email = False
+            return
+        if args.manifest is not None:
+            self._store_manifest(args.manifest)
+            return
+
         self.phones: List[str] = self._parse_arg_phone(args.TELEFONE)
         self.date = self._parse_arg_date(args.DATA)
         self.send_email: bool = args.envia_email
-        self.raw_path: str = self._parse_arg_raw_path(args.bruto)
+        with self.profiler.stage("parse_raw"):
+            self.raw_path: str = self._parse_arg_raw_path(args.bruto)
+        self._get_users(self.phones)
+
+    @property
+    def report_jobs(self) -> List["ReportArgs"]:
+        """Reports to generate: the manifest jobs, or these args"""
+        return self.manifest_jobs or [self]
+
+    def _store_manifest(self, path: str):
+        """
+        Read one report job per line
+
+        Every job is a `ReportArgs` with its own phones, date, raw data and
+        email flag. Raw files are parsed once however many jobs use them,
+        and users of every job are fetched in a single request.
+        """
+        if not os.path.exists(path):
+            raise argparse.ArgumentTypeError("parâmetro --manifest possui diretório inválido")
+
+        raw_data = {}  # {(real path, mtime): json_data}
+        self.manifest_jobs = []
+        with open(path, 'r', encoding='utf8') as file:
+            for i, line in enumerate(file, 1):
+                if not line.strip():
+                    continue
+                try:
+                    self.manifest_jobs.append(self.parse_job(json.loads(line), raw_data))
+                except (argparse.ArgumentTypeError, ValueError, KeyError) as exc:
+                    raise argparse.ArgumentTypeError(
+                        f"--manifest linha {i}: {exc}") from exc
+        if not self.manifest_jobs:
+            raise argparse.ArgumentTypeError("parâmetro --manifest não possui relatórios")
+
+        # shared values, as seen by the run
+        self.phones = list(dict.fromkeys(
+            phone for job in self.manifest_jobs for phone in job.phones))
+        self.send_email = any(job.send_email for job in self.manifest_jobs)
+        self._get_users(self.phones)
+        users_by_phone: Dict[str, List[dict]] = {}
+        for user in self.users:
+            users_by_phone.setdefault(user['phone'], []).append(user)
+        for job in self.manifest_jobs:
+            job.users = [user for phone in dict.fromkeys(job.phones)
+                         for user in users_by_phone.get(phone, ())]
+
+    def parse_job(self, data: dict, raw_data: dict) -> "ReportArgs":
+        """
+        One report job (a manifest line or a daemon request) into a `ReportArgs`
+
+        Users are not fetched.
+
+        :param data: `{"telefone": <phones>, "data": <date>, "bruto": <path>,
+            "envia_email": <bool>}`
+        :param raw_data: parsed raw files by path and modification time,
+            reused by jobs of the same file
+        """
+        job = ReportArgs(self._verbose)
+        job.profiler = self.profiler  # timings of every job go to one report
+        job.phones = job._parse_arg_phone(data['telefone'])  # pylint: disable=W0212
+        job.date = job._parse_arg_date(data['data'])  # pylint: disable=W0212
+        job.send_email = bool(data.get('envia_email', False))
+
+        raw_path = os.path.realpath(data['bruto'])
+        key = (raw_path, os.path.getmtime(raw_path) if os.path.exists(raw_path) else None)
+        job.raw_key = key
+        if key in raw_data:
+            job.raw_path, job.json_data = raw_path, raw_data[key]
+        else:
+            with self.profiler.stage("parse_raw"):
+                job.raw_path = job._parse_arg_raw_path(raw_path)  # pylint: disable=W0212
+            raw_data[key] = job.json_data
+        return job
 
     def _parse_arg_date(self, date_str: str) -> datetime:
         """Validate and Parse date string into datetime object"""
@@ -191,6 +372,13 @@ class ReportArgs:
         except ValueError as exc:
             raise argparse.ArgumentTypeError(invalid_date_msg) from exc
 
+    def _parse_arg_count(self, name: str, count: int) -> int:
+        """Validate number of processes/threads"""
+        if count < 1:
+            raise argparse.ArgumentTypeError(
+                f"parâmetro {name} deve ser maior que zero")
+        return count
+
     def _parse_arg_raw_path(self, raw_path: str):
         """From path read json data"""
         if not os.path.exists(raw_path):
@@ -209,8 +397,12 @@ class ReportArgs:
                 raise NotFoundErr("O arquivo não possui um formato suportado: " +
                                   str(self._JSON_DATA_FORMATS)) from exc
 
-    def _read_json_data(self, path: str, file_type: FileType) -> dict:
+    def _read_json_data(self, path: str, file_type: FileType) -> dict | RawSections:
         if file_type == "json":
+            if os.path.getsize(path) >= self.STREAM_MIN_SIZE:
+                # too big to keep parsed: read section by section when rendering
+                check_raw_file(path)
+                return RawSections(path)
             with open(path, "r", encoding="utf8") as f:
                 json_data = json.load(f)
             return json_data
@@ -233,20 +425,12 @@ class ReportArgs:
                     f"O telefone [{i}/{len(phones_list)}] " +
                     "deve ter: DDD + Dígito '9' + 8 números")
 
-        self._get_users(phones_list)
-
         return phones_list
 
     def _get_users(self, phones: List[str]):
-        # self.logger.debug(str(f'_get_users from phones{phones}'))
-        self.client.connect((self.host, self.port))
-        msg = json.dumps({'command': "get", 'phone': phones})
-        self.client.sendall(msg.encode())
-        response = self.client.recv(1024).decode()
-        self.client.close()
-        # self.logger.debug(str(f'_get_users response: {len(response)}'))
-        response_dict = json.loads(response)
-        self.users = response_dict['data']
+        """Fetch users, in concurrent batches (see `UserFetcher`)"""
+        with self.profiler.stage("fetch_users"):
+            self.users = UserFetcher(self.host, self.port).get(phones)
 
     def _print_error(self, message):
         print(f"error: {message}")
@@ -0,0 +1,212 @@
+"""
+report_daemon.py
+
+Responsability:
+- serve report jobs over a local socket, one job per connection
+- keep styles, parsed raw files and render processes warm between jobs
+"""
+
+import argparse
+import json
+import os
+import socket
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+from data_service.app.data_service import create_server_socket
+from report_generator.app.report_generator import ReportGenerator  # pylint: disable=E0401,E0611
+from report_generator.app.report_pdf import ReportPdf, get_styles  # pylint: disable=E0401,E0611
+from report_generator.app.user_fetcher import UserFetcher  # pylint: disable=E0401,E0611
+from report_generator.app.utils import get_logger  # pylint: disable=E0401,E0611
+
+DEFAULT_PORT = 5786
+
+
+def _warm_worker() -> int:
+    """Load styles and the shared header in a render process"""
+    get_styles()
+    ReportPdf._header_title()  # pylint: disable=W0212
+    return os.getpid()
+
+
+def request_report(job: dict, host='127.0.0.1', port=DEFAULT_PORT,
+                   timeout: float = None) -> dict:
+    """
+    Send one job to a running daemon and wait for its summary
+
+    :param job: see `ReportDaemon`
+    :raises ValueError: if the daemon refused the job
+    """
+    with socket.create_connection((host, port), timeout=timeout) as client:
+        client.sendall(json.dumps(job).encode() + b"\n")
+        with client.makefile('rb') as response:
+            data = response.readline().decode()
+    if not data:
+        raise ConnectionError("report daemon closed the connection")
+    if data.startswith("Error"):
+        raise ValueError(data.strip())
+    return json.loads(data)
+
+
+class ReportDaemon:
+    """
+    Report generator as a resident service
+
+    Every connection sends one job, as a `--manifest` line, and gets the
+    run summary back (see `ReportGenerator.run`):
+        ```
+        {"telefone": "01234567891", "data": "2024-02-02 10:12", "bruto": "/tmp/bruto.json"}
+        {"generated": 1, "delivered": 0, "errors": []}
+        ```
+
+    Jobs run concurrently, one thread each, but their PDFs are always
+    rendered by the `--jobs N` processes started with the daemon: cached
+    header flowables are shared and not thread-safe.
+
+    Example:
+        ```python
+        daemon = ReportDaemon(report)
+        threading.Thread(target=daemon.start_server).start()
+        daemon.ready.wait()
+        request_report({"telefone": ..., "data": ..., "bruto": ...})
+        ```
+    """
+
+    POLL_INTERVAL = 0.5
+    MAX_REQUEST_SIZE = 64 * 1024
+    REQUEST_TIMEOUT = 10.0
+    """Seconds a client may take to send its job line"""
+    RAW_CACHE_SIZE = 8
+    """Parsed raw files kept between jobs"""
+
+    server_socket: socket.socket = None
+    executor: ProcessPoolExecutor = None
+    is_running = False
+
+    def __init__(self, report: ReportGenerator, host='127.0.0.1', port=DEFAULT_PORT,
+                 data_service: UserFetcher = None):
+        """
+        :param report: generator with the daemon args (`--daemon`, `--jobs`,
+            `--senders`, `--stamp` and config)
+        :param data_service: fetcher of users
+        """
+        self.report = report
+        self.args = report.args
+        self.host = host
+        self.port = port
+        self.data_service = data_service or UserFetcher()
+        self.ready = threading.Event()
+        """Set once the render processes are warm"""
+
+        self.logger = get_logger("ReportDaemon")
+        self._jobs_lock = threading.Lock()
+        self._raw_data = {}  # see `ReportArgs.parse_job`
+        self._next_index = 0
+        self._threads: List[threading.Thread] = []
+
+    def start_server(self, server_socket: socket.socket = None):
+        """
+        Warm up and serve jobs until `stop_server` or a `shutdown` request
+
+        :param server_socket: listening socket to serve from, instead of
+            binding a new one
+        """
+        self.is_running = True
+        if server_socket is None:
+            server_socket = create_server_socket(self.host, self.port)
+        self.server_socket = server_socket
+        # wake up now and then to see if stop_server() was called
+        self.server_socket.settimeout(self.POLL_INTERVAL)
+
+        _warm_worker()  # forked processes inherit what is loaded here
+        self.executor = ProcessPoolExecutor(max_workers=self.args.jobs)
+        for future in [self.executor.submit(_warm_worker) for _ in range(self.args.jobs)]:
+            future.result()
+        self.ready.set()
+        self.logger.info("Daemon listening on %s:%s (%s render processes)",
+                         self.host, self.port, self.args.jobs)
+
+        try:
+            while self.is_running:
+                try:
+                    client_socket, _addr = self.server_socket.accept()
+                except socket.timeout:
+                    continue
+                thread = threading.Thread(target=self._handle_connection,
+                                          args=(client_socket,))
+                thread.start()
+                self._threads = [t for t in self._threads if t.is_alive()] + [thread]
+        finally:
+            self.server_socket.close()
+            self.is_running = False
+            for thread in self._threads:
+                thread.join()
+            self.executor.shutdown()
+            self.args.profiler.finish()  # timings of every job, with `--profile`
+            self.ready.clear()
+            self.logger.info("Stopped.")
+
+    def stop_server(self):
+        """Stop accepting jobs; running ones are finished"""
+        if self.is_running:
+            self.logger.info("Stopping daemon...")
+            self.is_running = False
+
+    def _handle_connection(self, client_socket: socket.socket):
+        with client_socket:
+            client_socket.settimeout(self.REQUEST_TIMEOUT)
+            try:
+                with client_socket.makefile('rb') as request:
+                    data = request.readline(self.MAX_REQUEST_SIZE)
+            except socket.timeout:
+                self.logger.warning("No job received in %ss, closing", self.REQUEST_TIMEOUT)
+                return
+            try:
+                response = self.handle_data(data.decode('utf-8', errors='replace').strip())
+            except Exception as exc:  # pylint: disable=W0718
+                self.logger.error("Failed job: %s", exc)
+                response = f"Error: {exc}".encode()
+            client_socket.sendall(response + b"\n")
+
+    def handle_data(self, data: str) -> bytes:
+        """Process one request message and return the response"""
+        if data == 'shutdown':
+            self.stop_server()
+            return b"Shutting down daemon"
+
+        try:
+            job_data: dict = json.loads(data)
+        except json.JSONDecodeError:
+            return b"Error: Invalid data format"
+        if not isinstance(job_data, dict):
+            return b"Error: Invalid data format"
+
+        try:
+            summary = self.handle_job(job_data)
+        except (argparse.ArgumentTypeError, KeyError, ValueError) as exc:
+            return f"Error: {exc}".encode()
+        return json.dumps(summary).encode()
+
+    def handle_job(self, data: dict) -> dict:
+        """Generate (and send) the PDFs of one job"""
+        with self._jobs_lock:
+            job = self.args.parse_job(data, self._raw_data)
+            while len(self._raw_data) > self.RAW_CACHE_SIZE:
+                del self._raw_data[next(iter(self._raw_data))]
+        if job.send_email and not self.args.origin_email:
+            raise ValueError("envia_email está ativo porém não foi encontrado "
+                             "'email_origem' em 'report_generator.yaml'")
+        job.config, job.origin_email = self.args.config, self.args.origin_email
+        job.jobs, job.senders, job.stamp = self.args.jobs, self.args.senders, self.args.stamp
+        job.cache_size = self.args.cache_size
+        job.users = self._get_users(job.phones)
+
+        with self._jobs_lock:
+            first_index = self._next_index
+            self._next_index += len(job.users)
+        return self.report.run(job, self.executor, first_index)
+
+    def _get_users(self, phones: List[str]) -> List[dict]:
+        """Fetch users in concurrent batches (see `UserFetcher`)"""
+        return self.data_service.get(phones)
@@ -2,20 +2,131 @@
 
 import argparse
 import os
-import shutil
-import smtplib
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, wait
 from datetime import datetime as dt
-from email.message import EmailMessage
+from functools import partial
+from itertools import islice
 from pathlib import Path
+from typing import Callable, Dict, Iterator, List, NamedTuple
 
 from data_service.app.data_service import DataService
+from report_generator.app.mailer import ReportMailer  # pylint: disable=E0401,E0611
+from report_generator.app.pdf_cache import PdfCache, raw_digest  # pylint: disable=E0401,E0611
+from report_generator.app.profiler import Profiler, Timings  # pylint: disable=E0401,E0611
 from report_generator.app.report_args import ReportArgs  # pylint: disable=E0401,E0611
-from report_generator.app.report_pdf import ReportPdf  # pylint: disable=E0401,E0611
+from report_generator.app.report_pdf import (  # pylint: disable=E0401,E0611
+    ReportBody, ReportPdf, pdf_filename
+)
 from report_generator.app.utils import get_logger  # pylint: disable=E0401,E0611
 
 app_folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 server = DataService()
 
+RenderResult = tuple[str, bytes | None, bool, Timings]
+"""File name, PDF data (if returned), whether it came from the cache and timings"""
+
+
+def render_pdf(json_data: dict, client_name: str, report_date: dt,
+               filename: str, body: ReportBody = None, return_data=False,
+               profile=False, cache: PdfCache = None, digest: str = None) -> RenderResult:
+    """
+    Render one client's PDF (or take it from the cache) and save it
+
+    :param body: shared pages from `ReportPdf.render_body`, to only stamp
+        the client info on them
+    :param return_data: also return the PDF, e.g. to email it without
+        reading it back
+    :param profile: time the `cache`, `build` (or `stamp`) and `write` stages
+    :param cache: rendered PDFs, by `digest` of the raw data (see `raw_digest`)
+    """
+    profiler = Profiler(profile)
+    data = None
+    if cache is not None:
+        key = cache.key(digest, client_name, report_date, ReportPdf.TEMPLATE_VERSION)
+        with profiler.stage("cache"):
+            data = cache.get(key)
+    cached = data is not None
+    if not cached:
+        with profiler.stage("build" if body is None else "stamp"):
+            data = ReportPdf(json_data, client_name, report_date).render(body)
+        if cache is not None:
+            with profiler.stage("cache"):
+                cache.put(key, data)
+    with profiler.stage("write"):
+        with open(filename, "wb") as out:
+            out.write(data)
+    return filename, data if return_data else None, cached, profiler.timings()
+
+
+def render_body(json_data: dict, report_date: dt) -> ReportBody:
+    """Lay out the pages shared by every client (see `ReportPdf.render_body`)"""
+    return ReportPdf(json_data, "", report_date).render_body()
+
+
+class RenderJob(NamedTuple):
+    """`render_pdf` args shared by the clients of a report job"""
+    json_data: dict
+    report_date: dt
+    body: ReportBody
+    return_data: bool
+    profile: bool
+    cache: PdfCache
+    digest: str
+
+    def render(self, client_name: str, filename: str) -> RenderResult:
+        """Render one client's PDF"""
+        return render_pdf(self.json_data, client_name, self.report_date, filename,
+                          self.body, self.return_data, self.profile, self.cache,
+                          self.digest)
+
+
+# report jobs of a worker process, see `_init_render_worker`
+_render_jobs: List[RenderJob] = None
+
+
+def _init_render_worker(jobs: List[RenderJob]):
+    """Receive the report data once per worker, not once per PDF"""
+    global _render_jobs  # pylint: disable=W0603
+    _render_jobs = jobs
+
+
+def _render_pdf(job: int, client_name: str, filename: str) -> RenderResult:
+    """Render one client's PDF of report job `job` in a worker process"""
+    return _render_jobs[job].render(client_name, filename)
+
+
+class RenderJobMissing(Exception):
+    """The worker process doesn't have the report job yet, see `_render_keyed`"""
+
+
+# report jobs of a long-lived worker process (e.g. of the report daemon)
+_keyed_jobs: OrderedDict[tuple, RenderJob] = OrderedDict()
+KEYED_JOBS_SIZE = 4
+"""Report jobs kept per worker process"""
+
+
+def _render_keyed(key: tuple, job: RenderJob | None, client_name: str,
+                  filename: str) -> RenderResult:
+    """
+    Render one client's PDF of the report job `key` in a long-lived worker
+
+    Report data is sent once per worker: tasks come with `job=None`, and
+    if this worker doesn't have it yet, the task is sent again with it.
+
+    :raises RenderJobMissing: if `job` is None and was not received before
+    """
+    if job is not None:
+        _keyed_jobs[key] = job
+        while len(_keyed_jobs) > KEYED_JOBS_SIZE:
+            _keyed_jobs.popitem(last=False)
+    elif key not in _keyed_jobs:
+        raise RenderJobMissing(key)
+    _keyed_jobs.move_to_end(key)
+    return _keyed_jobs[key].render(client_name, filename)
+
 
 class ReportGenerator:
     """
@@ -32,16 +143,25 @@ class ReportGenerator:
     # args
     args: ReportArgs
 
+    OUTBOX_SIZE = 16
+    """Rendered PDFs waiting to be emailed"""
+
     def __init__(self, verbose=None) -> None:
         self.verbose = verbose
         self.logger = get_logger("ReportGenerator")
+        self._summary_lock = threading.Lock()
+        self.cache_folder = f"{app_folder}/cache"
+        """Rendered PDFs kept between runs, see `--cache-size`"""
         self._init_folders()
 
     def _init_folders(self):
         Path(f"{app_folder}/log").mkdir(parents=True, exist_ok=True)
-        if os.path.exists(f"{app_folder}/generated"):
-            shutil.rmtree(f"{app_folder}/generated")
         Path(f"{app_folder}/generated").mkdir(parents=True, exist_ok=True)
+        # only the last run's PDFs: rendered ones are kept in the cache
+        with os.scandir(f"{app_folder}/generated") as entries:
+            for entry in entries:
+                if entry.name.endswith(".pdf") and entry.is_file():
+                    os.remove(entry.path)
         self.logger.info("Folders cleared")
 
     def parse_args(self) -> Exception | None:
@@ -55,50 +175,211 @@ class ReportGenerator:
                 return
             raise arg_exc
 
-    def generate_pdf(self):
+    def generate_pdf(self) -> dict:
         """
         For every client, generate pdf and send email
+
+        See `run`. With `--profile`, the timing report is written at the end.
         """
-        self.logger.info(f"Found {len(self.args.users)} users")
-        for user in self.args.users:
-            pdf = ReportPdf(self.args.json_data, user['name'], self.args.date)
-            pdf_path = pdf.generate_pdf()
-            self.logger.info(str(f"PDF saved to {pdf_path.rsplit('/')[-1]}"))
-            if self.args.send_email:
-                self._send_email(user, pdf_path)
+        summary = self.run(self.args)
+        self.args.profiler.finish()
+        return summary
+
+    def run(self, args: ReportArgs, executor: Executor = None, first_index=0) -> dict:
+        """
+        For every client of `args`, generate pdf and send email
+
+        Rendering and sending run as a pipeline: PDFs (rendered here, or
+        by `--jobs N` processes) go to a bounded outbox drained by
+        `--senders N` threads, each with its own SMTP session. When the
+        outbox is full, rendering waits, so memory stays capped. A failing
+        client doesn't stop the others. With `--manifest`, every report
+        job goes through the same pipeline.
+
+        :param executor: process pool kept by the caller (e.g. the report
+            daemon), rendering every PDF instead of a pool of this run
+        :param first_index: position of the first PDF in its file name
+        :return: `{"generated": <count>, "cached": <count of generated taken
+            from the cache>, "delivered": <count>, "errors": [{"job": <manifest
+            index>, "email": <email>, "stage": "pdf" | "email", "error": <message>}]}`
+        """
+        jobs = args.report_jobs
+        self.logger.info("Found %s users in %s report jobs",
+                         sum(len(job.users) for job in jobs), len(jobs))
+        summary = {"generated": 0, "cached": 0, "delivered": 0, "errors": []}
+        cache = PdfCache(self.cache_folder, args.cache_size) if args.cache_size else None
+
+        senders: List[threading.Thread] = []
+        outbox: queue.Queue = queue.Queue(self.OUTBOX_SIZE)
+        if any(job.send_email for job in jobs):
+            senders = [
+                threading.Thread(target=self._sender, args=(args, outbox, summary),
+                                 name=f"sender-{i}")
+                for i in range(args.senders)
+            ]
+        for sender in senders:
+            sender.start()
+
+        try:
+            for job, user, result in self._render_pdfs(args, cache, executor, first_index):
+                if isinstance(result, Exception):
+                    self._add_error(summary, job, user, "pdf", result)
+                    continue
+                pdf_path, pdf_data, cached, timings = result
+                args.profiler.add_timings(timings, (job, user['email']))
+                summary['generated'] += 1
+                summary['cached'] += cached
+                self.logger.info("PDF saved to %s", pdf_path.rsplit('/')[-1])
+                if jobs[job].send_email:
+                    outbox.put((job, user, pdf_data))
+        finally:
+            for _ in senders:
+                outbox.put(None)
+            for sender in senders:
+                sender.join()
+
+        self.logger.info("%s PDFs generated (%s cached), %s delivered, %s errors",
+                         summary['generated'], summary['cached'], summary['delivered'],
+                         len(summary['errors']))
+        return summary
+
+    def _sender(self, args: ReportArgs, outbox: queue.Queue, summary: dict):
+        """
+        Send emails from the outbox until a `None`
+
+        If the sender itself fails (e.g. no mail config), it keeps draining
+        the outbox, failing every email, so rendering never waits on it.
+        """
+        done = False
+        try:
+            with ReportMailer(args.config['mail_host'], args.config['mail_port'],
+                              args.origin_email) as mailer:
+                while (item := outbox.get()) is not None:
+                    job, user, pdf_data = item
+                    try:
+                        with args.profiler.stage("email", (job, user['email'])):
+                            self._send_email(mailer, user, pdf_data)
+                    except Exception as exc:  # pylint: disable=W0718
+                        self._add_error(summary, job, user, "email", exc)
+                        continue
+                    with self._summary_lock:
+                        summary['delivered'] += 1
+                done = True
+        except Exception as exc:  # pylint: disable=W0718
+            self.logger.error("Sender failed: %s", exc)
+            while not done and (item := outbox.get()) is not None:
+                job, user, _ = item
+                self._add_error(summary, job, user, "email", exc)
+
+    def _render_pdfs(self, args: ReportArgs, cache: PdfCache = None,
+                     executor: Executor = None, first_index=0
+                     ) -> Iterator[tuple[int, dict, RenderResult | Exception]]:
+        """
+        Render every PDF, producing (job index, user, result or error) as
+        they finish
+
+        PDF data is only kept when it will be emailed. Jobs with the same
+        raw data and date share their stamped body, which is not laid out
+        at all if every client is cached.
+        """
+        jobs = args.report_jobs
+        tasks = []  # (job index, user, filename)
+        for i, job in enumerate(jobs):
+            for user in job.users:
+                filename = pdf_filename(user['name'], job.date, first_index + len(tasks))
+                tasks.append((i, user, f"{app_folder}/generated/{filename}"))
+
+        digests: Dict[int, str] = {}
+        bodies: Dict[tuple, ReportBody] = {}
+        render_jobs: List[RenderJob] = []
+        for job in jobs:
+            digest = None
+            if cache is not None:
+                if id(job.json_data) not in digests:
+                    digests[id(job.json_data)] = raw_digest(job.json_data)
+                digest = digests[id(job.json_data)]
+
+            body = None
+            if args.stamp and not (cache is not None and all(
+                    cache.contains(cache.key(digest, user['name'], job.date,
+                                             ReportPdf.TEMPLATE_VERSION))
+                    for user in job.users)):
+                # lay out the shared pages once, then only stamp each client
+                key = (id(job.json_data), job.date)
+                if key not in bodies:
+                    with args.profiler.stage("body"):
+                        bodies[key] = (
+                            render_body(job.json_data, job.date) if executor is None
+                            else executor.submit(render_body, job.json_data, job.date).result())
+                body = bodies[key]
+            render_jobs.append(RenderJob(job.json_data, job.date, body, job.send_email,
+                                         args.profiler.enabled, cache, digest))
+
+        if executor is not None:
+            # the pool outlives this run: send report data once per worker
+            keys = [(job.raw_key or id(job.json_data), job.date,
+                     render_job.body is not None, job.send_email, args.profiler.enabled,
+                     (cache.folder, cache.max_size) if cache is not None else None)
+                    for job, render_job in zip(jobs, render_jobs)]
+
+            def submit(job: int, client_name: str, filename: str, resend=False) -> Future:
+                return executor.submit(_render_keyed, keys[job],
+                                       render_jobs[job] if resend else None,
+                                       client_name, filename)
+            yield from self._render_in_pool(tasks, submit, args.jobs)
+            return
+
+        if args.jobs == 1:
+            for job, user, filename in tasks:
+                try:
+                    yield job, user, render_jobs[job].render(user['name'], filename)
+                except Exception as exc:  # pylint: disable=W0718
+                    yield job, user, exc
+            return
+
+        with ProcessPoolExecutor(
+                max_workers=args.jobs, initializer=_init_render_worker,
+                initargs=(render_jobs,)) as pool:
+            yield from self._render_in_pool(tasks, partial(pool.submit, _render_pdf), args.jobs)
+
+    def _render_in_pool(self, tasks: List[tuple], submit: Callable[..., Future], jobs: int
+                        ) -> Iterator[tuple[int, dict, RenderResult | Exception]]:
+        """
+        Render tasks with `submit(job, client_name, filename)`, as they finish
+
+        The pool only gets a few PDFs ahead of the consumer, so finished
+        PDFs don't pile up. A task failing with `RenderJobMissing` is sent
+        again with `submit(job, client_name, filename, True)`.
+        """
+        tasks = iter(tasks)
+        pending: Dict[Future, tuple[int, dict, str]] = {}
+        while True:
+            for job, user, filename in islice(tasks, 2 * jobs - len(pending)):
+                pending[submit(job, user['name'], filename)] = job, user, filename
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                job, user, filename = pending.pop(future)
+                try:
+                    result = future.result()
+                except RenderJobMissing:
+                    pending[submit(job, user['name'], filename, True)] = job, user, filename
+                    continue
+                except Exception as exc:  # pylint: disable=W0718
+                    result = exc
+                yield job, user, result
+
+    def _add_error(self, summary: dict, job: int, user: dict, stage: str, exc: Exception):
+        self.logger.error("Failed %s for %s: %s", stage, user['email'], exc)
+        with self._summary_lock:
+            summary['errors'].append(
+                {"job": job, "email": user['email'], "stage": stage, "error": str(exc)})
 
     def _print_error(self, message):
         print(f"error: {message}")
 
-    def _send_email(self, user: dict, pdf_path: str):
+    def _send_email(self, mailer: ReportMailer, user: dict, pdf_data: bytes):
         """Send email"""
-        self.logger.info(f"Sending email to {user['email']}")
-        now = dt.now().strftime(r"%m/%d/%Y")
-
-        msg = EmailMessage()
-        msg['Subject'] = f"Relatório Meteorológico - {now}"
-        msg['From'] = self.args.origin_email
-        msg['To'] = [user['email']]
-
-        msg.add_alternative(f"""\
-        <html>
-        <body>
-            <h1>Relatório Meteorológico</h1>
-            <p>Segue em anexo o <b>relatório meteorológico</b> para a data de hoje ({now}).</p>
-            <p>Nimbus Tecnologia</p>
-        </body>
-        </html>
-        """, subtype='html')
-
-        # attach pdf
-        with open(pdf_path, 'rb') as f:
-            pdf_data = f.read()
-            msg.add_attachment(pdf_data, maintype='application',
-                               subtype='pdf', filename='relatorio_meteorologico.pdf')
-
-        # send
-
-        host = self.args.config['mail_host']
-        port = self.args.config['mail_port']
-        with smtplib.SMTP(host, port) as smtp:
-            smtp.send_message(msg)
+        self.logger.info("Sending email to %s", user['email'])
+        mailer.send(user['email'], pdf_data)
@@ -1,31 +1,211 @@
 """report_pdf.py"""
+import io
 import logging
 import os
-import time
-from typing import Dict, List
+from functools import lru_cache
+from itertools import chain, islice
+from typing import Dict, Iterable, Iterator, List
 from datetime import datetime as dt
 
-from PyPDF2 import PdfReader, PdfWriter  # pylint: disable=E0401
-from reportlab.platypus import Frame, PageBreak, KeepTogether
+from PyPDF2 import PdfReader  # pylint: disable=E0401
+from PyPDF2.generic import (  # pylint: disable=E0401
+    ArrayObject, DictionaryObject, IndirectObject, NameObject, PdfObject
+)
+from reportlab.platypus import Frame, PageBreak, KeepTogether, NextPageTemplate, PageTemplate
+from reportlab.platypus.flowables import Flowable
 from reportlab.lib import colors
 from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY, TA_RIGHT
-from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.styles import ParagraphStyle, StyleSheet1, getSampleStyleSheet
 from reportlab.lib.units import mm
 from reportlab.pdfgen import canvas
 from reportlab.platypus import (
+    BaseDocTemplate,
     Paragraph,
-    SimpleDocTemplate,
     Spacer,
     Table,
     TableStyle,
 )
 from unidecode import unidecode
 
+from report_generator.app.columns import SectionColumns  # pylint: disable=E0401,E0611
+from report_generator.app.raw_data import RawSections  # pylint: disable=E0401,E0611
 from report_generator.app.utils import get_logger  # pylint: disable=E0401,E0611
 
 app_folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 
+def pdf_filename(client_name: str, report_date: dt, index: int = None) -> str:
+    """
+    File name of a client's report
+
+    Same inputs, same name; `index` (position of the client in the run)
+    tells apart clients with the same name.
+    """
+    name = client_name.replace('/', '_').replace('\\', '_')
+    prefix = report_date.strftime(r"%Y%m%d_%H%M")
+    if index is not None:
+        prefix += f" {index:05d}"
+    return f"{prefix} {name}.pdf"
+
+
+@lru_cache(maxsize=None)
+def get_styles() -> StyleSheet1:
+    """Report styles, built once per process (shared, do not change them)"""
+    custom_styles = getSampleStyleSheet()
+    custom_styles.add(ParagraphStyle(name='Center', alignment=TA_CENTER))
+    custom_styles.add(ParagraphStyle(name='Justify', alignment=TA_JUSTIFY))
+    custom_styles.add(ParagraphStyle(
+        name='Fenomeno', fontSize=11, textColor=colors.white))
+    custom_styles.add(ParagraphStyle(
+        name='HeaderTitle', fontSize=20, leading=26, textColor=colors.white, alignment=1))
+    custom_styles.add(ParagraphStyle(
+        name='ClientInfoLeft', fontSize=14, leading=12, spaceAfter=14, textColor=colors.black))
+    custom_styles.add(ParagraphStyle(
+        name='ClientInfoRight', fontSize=14, leading=12, spaceAfter=14,
+        textColor=colors.black, alignment=TA_RIGHT, ))
+    custom_styles.add(ParagraphStyle(
+        name='HeaderSection', fontSize=14, leading=12, spaceAfter=14, textColor=colors.black, ))
+    custom_styles.add(ParagraphStyle(
+        name='Description', fontSize=11, leading=12,
+        spaceAfter=14, textColor=colors.black, alignment=TA_JUSTIFY,))
+    return custom_styles
+
+
+class ReportBody:
+    """
+    Report pages without client info, rendered once and stamped per client
+
+    Stamping appends an incremental update to the body pdf: the client
+    info as a form XObject, plus new versions of the page objects that
+    draw it after their (untouched) content. The body is not laid out,
+    parsed or copied again; only the small overlay is new per client.
+    """
+
+    _STAMP = b"/ClientInfo"
+
+    def __init__(self, pdf: bytes):
+        self.pdf = pdf
+        reader = PdfReader(io.BytesIO(pdf))
+        self._stamp_num = reader.trailer['/Size']
+        prefix_num = self._stamp_num + 1
+        suffix_num = self._stamp_num + 2
+        self._size = self._stamp_num + 3
+        self._prev = int(pdf[pdf.rindex(b"startxref") + 9:].split()[0])
+        self._trailer = b" ".join(
+            key.encode() + b" " + _pdf_bytes(reader.trailer.raw_get(key))
+            for key in ('/Root', '/Info', '/ID') if key in reader.trailer)
+
+        # new page objects are the same for every client
+        self._pages: List[tuple[int, bytes]] = []
+        for page in reader.pages:
+            contents = page.raw_get('/Contents')
+            if not isinstance(contents, ArrayObject):
+                contents = ArrayObject([contents])
+            resources = page['/Resources'].get_object()
+            xobjects = DictionaryObject(resources.get('/XObject', {}))
+            xobjects[NameObject(self._STAMP.decode())] = IndirectObject(
+                self._stamp_num, 0, None)
+
+            new_page = DictionaryObject(page)
+            new_page[NameObject('/Contents')] = ArrayObject([
+                IndirectObject(prefix_num, 0, None), *contents,
+                IndirectObject(suffix_num, 0, None)])
+            new_page[NameObject('/Resources')] = DictionaryObject(resources)
+            new_page['/Resources'][NameObject('/XObject')] = xobjects
+            self._pages.append((page.indirect_reference.idnum, _pdf_bytes(new_page)))
+
+        # page content is wrapped to draw the stamp on a clean graphics state
+        self._objects = [
+            (prefix_num, _pdf_stream(b"q", b"")),
+            (suffix_num, _pdf_stream(b"Q q " + self._STAMP + b" Do Q", b"")),
+            *((num, obj + b"\n") for num, obj in self._pages),
+        ]
+
+    def stamp(self, overlay: bytes) -> bytes:
+        """
+        Pdf of one client
+
+        :param overlay: one-page pdf with the client info, drawn over
+            every page
+        """
+        page = PdfReader(io.BytesIO(overlay)).pages[0]
+        form = (
+            b"/Type /XObject /Subtype /Form /BBox " + _pdf_bytes(page.mediabox) +
+            b" /Resources " + _pdf_bytes(_resolve(page['/Resources'])))
+        objects = [(self._stamp_num, _pdf_stream(page.get_contents().get_data(), form)),
+                   *self._objects]
+
+        out = io.BytesIO()
+        out.write(self.pdf)
+        offsets = []
+        for num, obj in objects:
+            offsets.append((num, out.tell()))
+            out.write(b"%d 0 obj\n" % num + obj + b"endobj\n")
+
+        xref = out.tell()
+        out.write(b"xref\n0 1\n0000000000 65535 f \n")
+        for num, offset in sorted(offsets):
+            out.write(b"%d 1\n%010d 00000 n \n" % (num, offset))
+        out.write(b"trailer\n<< /Size %d %s /Prev %d >>\nstartxref\n%d\n%%%%EOF\n" % (
+            self._size, self._trailer, self._prev, xref))
+        return out.getvalue()
+
+
+def _pdf_bytes(obj: PdfObject) -> bytes:
+    """Serialized pdf object"""
+    out = io.BytesIO()
+    obj.write_to_stream(out, None)
+    return out.getvalue()
+
+
+def _pdf_stream(data: bytes, entries: bytes) -> bytes:
+    """Serialized (uncompressed) stream object"""
+    return (b"<< " + entries + b" /Length %d >>\nstream\n" % len(data) +
+            data + b"\nendstream\n")
+
+
+def _resolve(obj: PdfObject) -> PdfObject:
+    """Copy of `obj` with indirect references replaced by their objects"""
+    obj = obj.get_object()
+    if isinstance(obj, DictionaryObject):
+        return DictionaryObject({k: _resolve(v) for k, v in obj.items()})
+    if isinstance(obj, ArrayObject):
+        return ArrayObject([_resolve(v) for v in obj])
+    return obj
+
+
+class LazyFlowables(list):
+    """
+    Story for `doc.build`, produced as it is consumed
+
+    `doc.build` takes a list and works on its front: it asks the length,
+    reads and deletes the first flowables and puts split parts back. This
+    list only holds the next `batch` flowables, refilled from `source`
+    whenever its length is asked, so the story never is all in memory.
+    """
+
+    def __init__(self, source: Iterable[Flowable], batch=64):
+        super().__init__()
+        self.batch = batch
+        self._source = iter(source)
+        self._fill()
+
+    def __len__(self):
+        self._fill()
+        return super().__len__()
+
+    def _fill(self):
+        if self._source is None:
+            return
+        missing = self.batch - super().__len__()
+        if missing <= 0:
+            return
+        chunk = list(islice(self._source, missing))
+        if len(chunk) < missing:
+            self._source = None  # exhausted
+        self.extend(chunk)
+
+
 class ReportPdf:
     """
     Generate Report PDF
@@ -36,82 +216,136 @@ class ReportPdf:
     - Build PDF
     - Save to file
     """
+    TEMPLATE_VERSION = 2
+    """Bump on any layout change: cached PDFs (see `PdfCache`) are keyed by it"""
+
     _PAGE_WIDTH, _PAGE_HEIGHT = 200 * mm, 150 * mm
     _LEFT_MARGIN1, _RIGHT_MARGIN = 5.9 * mm, 8 * mm
     _LEFT_MARGIN2 = 2.1 * mm
     _LEFT_MARGIN = _LEFT_MARGIN1 + _LEFT_MARGIN2
     _TOP_MARGIN, _BOTTOM_MARGIN = 37 * mm, 8 * mm
     _INNER_WIDTH = _PAGE_WIDTH - _LEFT_MARGIN1 - _LEFT_MARGIN2 - _RIGHT_MARGIN
-    _section: str
+    _with_client_info = True
+    _SECTIONS = ["Análise", "Previsão"]  # business rules: sections and order
 
-    def __init__(self, json_data: dict, client_name: str, report_date: dt):
+    def __init__(self, json_data: dict | RawSections, client_name: str, report_date: dt):
+        """
+        :param json_data: `{section: [entry]}`, or a `RawSections` to read
+            the raw file section by section while rendering
+        """
         self.data = json_data
         self.client_name = client_name
         self.report_date = report_date
-        self.styles = getSampleStyleSheet()
-        self.custom_styles = self._create_custom_styles()
+        self.styles = self.custom_styles = get_styles()
         self.logger = get_logger("ReportPdf")
 
-    def _create_custom_styles(self):
-        custom_styles = getSampleStyleSheet()
-        custom_styles.add(ParagraphStyle(name='Center', alignment=TA_CENTER))
-        custom_styles.add(ParagraphStyle(name='Justify', alignment=TA_JUSTIFY))
-        custom_styles.add(ParagraphStyle(
-            name='Fenomeno', fontSize=11, textColor=colors.white))
-        custom_styles.add(ParagraphStyle(
-            name='HeaderTitle', fontSize=20, leading=26, textColor=colors.white, alignment=1))
-        custom_styles.add(ParagraphStyle(
-            name='ClientInfoLeft', fontSize=14, leading=12, spaceAfter=14, textColor=colors.black))
-        custom_styles.add(ParagraphStyle(
-            name='ClientInfoRight', fontSize=14, leading=12, spaceAfter=14,
-            textColor=colors.black, alignment=TA_RIGHT, ))
-        custom_styles.add(ParagraphStyle(
-            name='HeaderSection', fontSize=14, leading=12, spaceAfter=14, textColor=colors.black, ))
-        custom_styles.add(ParagraphStyle(
-            name='Description', fontSize=11, leading=12,
-            spaceAfter=14, textColor=colors.black, alignment=TA_JUSTIFY,))
-        return custom_styles
-
     def generate_pdf(self, filename: str = None) -> str:
         """Save pdf to file"""
         if not filename:
             filename = f"{app_folder}/generated/" +\
-                f"{int(time.time())} {self.client_name}.pdf"
-        # build pdfs per section (distinct headers)
-        self._sort_sections()
-        pdf_writer = PdfWriter()  # type: ignore
-        for section, data in self.data.items():
-            self._section = section
-            temp_file = "$.temp.pdf"
-            doc = SimpleDocTemplate(
-                temp_file, pagesize=(self._PAGE_WIDTH, self._PAGE_HEIGHT),
-                rightMargin=self._RIGHT_MARGIN,
-                leftMargin=self._LEFT_MARGIN1,
-                topMargin=self._TOP_MARGIN,
-                bottomMargin=self._BOTTOM_MARGIN,
-            )
-
-            elements = []
-            self._add_section(elements, data)
-            doc.build(elements, onFirstPage=self._add_header,
-                      onLaterPages=self._add_header)
-
-            pdf_reader = PdfReader(temp_file)
-            for page in pdf_reader.pages:
-                pdf_writer.add_page(page)
+                pdf_filename(self.client_name, self.report_date)
+        self._build_pages(filename)
+
+        print(filename.rsplit('/')[-1])
+        return filename
+
+    def render_body(self) -> ReportBody:
+        """
+        Render the pages without client info, shared by every client
+
+        The client name is ignored; see `stamp`.
+        """
+        self._with_client_info = False
+        try:
+            out = io.BytesIO()
+            self._build_pages(out)
+        finally:
+            self._with_client_info = True
+        return ReportBody(out.getvalue())
+
+    def stamp(self, body: ReportBody, filename: str = None) -> str:
+        """
+        Save pdf to file, drawing the client info over `render_body` pages
+
+        Much cheaper than `generate_pdf`: no layout, only a small overlay
+        appended to the body. Falls back to a full render when the
+        client info doesn't take the height the body was laid out for
+        (e.g. a name too long for one line).
+        """
+        if not filename:
+            filename = f"{app_folder}/generated/" +\
+                pdf_filename(self.client_name, self.report_date)
 
         # save pdf
         with open(filename, "wb") as out:
-            pdf_writer.write(out)
-
-        # delete temp
-        if os.path.exists("$.temp.pdf"):
-            os.remove("$.temp.pdf")
+            out.write(self.render(body))
 
         print(filename.rsplit('/')[-1])
         return filename
 
-    def _add_header(self, _canvas: canvas, doc: SimpleDocTemplate):
+    def render(self, body: ReportBody = None) -> bytes:
+        """
+        Pdf in memory
+
+        :param body: from `render_body`, to only stamp the client info
+            on it (see `stamp`)
+        """
+        if body is not None:
+            client_info, client_h = self._header_client_info(
+                self.client_name, self.report_date)
+            if client_h == self._header_client_info("", self.report_date)[1]:
+                title_h = self._header_title()[1]
+
+                # overlay
+                buffer = io.BytesIO()
+                _canvas = canvas.Canvas(
+                    buffer, pagesize=(self._PAGE_WIDTH, self._PAGE_HEIGHT))
+                client_info.drawOn(
+                    _canvas, self._LEFT_MARGIN, self._PAGE_HEIGHT - (title_h + client_h + 6))
+                _canvas.showPage()
+                _canvas.save()
+                return body.stamp(buffer.getvalue())
+
+        out = io.BytesIO()
+        self._build_pages(out)
+        return out.getvalue()
+
+    def _build_pages(self, out: str | io.BytesIO):
+        """
+        Build every section in a single document
+
+        Each section has its own page template, so the header knows the
+        section of the page it is drawn on. Sections are consumed as they
+        are read, and their flowables created as `doc.build` reaches them
+        (see `LazyFlowables`), so only a batch of them is alive at a time.
+        """
+        # an empty section gets no page at all
+        sections = (section for section in self._iter_sections() if section[1])
+        first = next(sections, None)
+        doc = BaseDocTemplate(
+            out, pagesize=(self._PAGE_WIDTH, self._PAGE_HEIGHT),
+            rightMargin=self._RIGHT_MARGIN,
+            leftMargin=self._LEFT_MARGIN1,
+            topMargin=self._TOP_MARGIN,
+            bottomMargin=self._BOTTOM_MARGIN,
+        )
+        frame = Frame(doc.leftMargin, doc.bottomMargin, doc.width, doc.height, id='normal')
+        template_ids = list(self._SECTIONS)
+        if first is not None:
+            # the first page takes the first template
+            template_ids.remove(first[0])
+            template_ids.insert(0, first[0])
+        doc.addPageTemplates([
+            PageTemplate(id=section, frames=[frame], onPage=self._add_header)
+            for section in template_ids
+        ])
+
+        if first is not None:
+            sections = chain([first], sections)
+            first = None  # raw entries go as soon as laid out
+        doc.build(LazyFlowables(self._iter_flowables(sections)))
+
+    def _add_header(self, _canvas: canvas, doc: BaseDocTemplate):
         """
         Create header content
 
@@ -119,17 +353,46 @@ class ReportPdf:
             Relatório Meteorológico
             Cliente: Joao       Data de confecção: 01/01/2024
             Análise
+
+        Components come pre-wrapped from the header caches, so a page
+        only costs drawing them.
         """
         _canvas.saveState()
 
         # header
+        header_table, h = self._header_title()
+        header_table.drawOn(
+            _canvas, 0, self._PAGE_HEIGHT - h)
+
+        # client info
+        client_info_table, _h = self._header_client_info(
+            self.client_name if self._with_client_info else "", self.report_date)
+        h = h + _h + 6
+        if self._with_client_info:
+            client_info_table.drawOn(
+                _canvas, self._LEFT_MARGIN, self._PAGE_HEIGHT - h)
+
+        # section
+        section, _h = self._header_section(doc.pageTemplate.id)
+        h = h + _h + 12
+        section.drawOn(
+            _canvas, self._LEFT_MARGIN, self._PAGE_HEIGHT - h)
+        _canvas.restoreState()
+
+    # header caches: flowables are shared by every ReportPdf of the process
+    # (not thread-safe: drawing binds a flowable to the canvas)
+
+    @classmethod
+    @lru_cache(maxsize=None)
+    def _header_title(cls) -> tuple[Table, float]:
+        """Title bar and its height"""
         header_title = [
             [Paragraph("<font color='white'><b>Relatório Meteorológico</b></font>",
-                       self.custom_styles['HeaderTitle'])],
+                       get_styles()['HeaderTitle'])],
             [""]
         ]
         header_table = Table(
-            header_title, colWidths=[self._PAGE_WIDTH], rowHeights=[13 * mm, 1.5 * mm])
+            header_title, colWidths=[cls._PAGE_WIDTH], rowHeights=[13 * mm, 1.5 * mm])
         header_table.setStyle(TableStyle([
             ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#073763')),
             ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
@@ -137,64 +400,92 @@ class ReportPdf:
             ('VALIGN', (0, 0), (-1, 0), 'TOP'),
             ('BACKGROUND', (0, 1), (-1, 1), colors.HexColor('#ffab40')),
         ]))
-        h = header_table.wrap(doc.width, doc.topMargin)[1]
-        header_table.drawOn(
-            _canvas, 0, self._PAGE_HEIGHT - h)
+        return header_table, cls._wrap(header_table)
 
-        # client info
-        client_info_width = self._PAGE_WIDTH - self._LEFT_MARGIN - self._RIGHT_MARGIN
+    @classmethod
+    @lru_cache(maxsize=128)
+    def _header_client_info(cls, client_name: str, report_date: dt) -> tuple[Table, float]:
+        """Client info line and its height"""
+        client_info_width = cls._PAGE_WIDTH - cls._LEFT_MARGIN - cls._RIGHT_MARGIN
         client_info_table = Table(
-            [[Paragraph(f"<font><b>Cliente:</b></font> {self.client_name}",
-                        self.custom_styles['ClientInfoLeft']),
-              Paragraph(f"<b>Data de confecção:</b> {self.report_date.strftime(r"%m/%d/%Y")}",
-                        self.custom_styles['ClientInfoRight'])]],
+            [[Paragraph(f"<font><b>Cliente:</b></font> {client_name}",
+                        get_styles()['ClientInfoLeft']),
+              Paragraph(f"<b>Data de confecção:</b> {report_date.strftime(r"%m/%d/%Y")}",
+                        get_styles()['ClientInfoRight'])]],
             colWidths=[client_info_width/2,  client_info_width/2]
         )
         client_info_table.setStyle(TableStyle([
             ('FONTSIZE', (0, 0), (-1, 0), 16),
             ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
         ]))
-        _h = h
-        h = client_info_table.wrap(doc.width, doc.topMargin)[1]
-        h = _h + h + 6
-        client_info_table.drawOn(
-            _canvas, self._LEFT_MARGIN, self._PAGE_HEIGHT - h)
-
-        # section
-        section = Table([[Paragraph(
-            f"<strong>{self._section}</strong>", self.custom_styles['HeaderSection'])]],
-            colWidths=[self._INNER_WIDTH],
+        return client_info_table, cls._wrap(client_info_table)
+
+    @classmethod
+    @lru_cache(maxsize=64)
+    def _header_section(cls, section: str) -> tuple[Table, float]:
+        """Section bar and its height"""
+        section_table = Table([[Paragraph(
+            f"<strong>{section}</strong>", get_styles()['HeaderSection'])]],
+            colWidths=[cls._INNER_WIDTH],
         )
-        section.setStyle(TableStyle([
-            ('LEFTPADDING', (0, 0), (-1, 0), self._LEFT_MARGIN2),
+        section_table.setStyle(TableStyle([
+            ('LEFTPADDING', (0, 0), (-1, 0), cls._LEFT_MARGIN2),
         ]))
-        _h = h
-        h = section.wrap(doc.width, doc.topMargin)[1]
-        h = _h + h + 12
-        section.drawOn(
-            _canvas, self._LEFT_MARGIN, self._PAGE_HEIGHT - h)
-        # elements.append(Spacer(1, 12))
+        return section_table, cls._wrap(section_table)
 
-    def _sort_sections(self):
-        """Sort sections"""
-        keys = ["Análise", "Previsão"]  # business rules
-        # { normalized: original }
-        normalized_keys = {unidecode(key).lower(): key for key in self.data}
-        sorted_keys = []
-        sorted_data = {}
+    @classmethod
+    def _wrap(cls, flowable: Table) -> float:
+        """Height of a header component"""
+        return flowable.wrap(cls._PAGE_WIDTH - cls._LEFT_MARGIN1 - cls._RIGHT_MARGIN,
+                             cls._TOP_MARGIN)[1]
 
-        for key in keys:
-            normalized_key = unidecode(key).lower()
-            if normalized_key in normalized_keys:
-                sorted_keys.append(normalized_keys[normalized_key])
-                sorted_data[key] = self.data[normalized_keys[normalized_key]]
+    def _iter_sections(self) -> Iterator[tuple[str, List[dict]]]:
+        """
+        Sections in business order, named as in `_SECTIONS`
 
-        self.data = sorted_data
+        Read in file order: a section that comes before its turn is held
+        until then; any other is skipped.
+        """
+        # { normalized: name }
+        names = {unidecode(key).lower(): key for key in self._SECTIONS}
+        held: Dict[str, List[dict]] = {}
+        turn = 0
+
+        for key, entries in self.data.items():
+            name = names.get(unidecode(key).lower())
+            if name is None:
+                continue
+            held[name] = entries
+            while turn < len(self._SECTIONS) and self._SECTIONS[turn] in held:
+                yield self._SECTIONS[turn], held.pop(self._SECTIONS[turn])
+                turn += 1
+
+        for name in self._SECTIONS:
+            if name in held:
+                yield name, held.pop(name)
+
+    def _iter_flowables(self, sections: Iterator[tuple[str, List[dict]]]
+                        ) -> Iterator[Flowable]:
+        """Flowables of every non-empty section, each one starting on a new page"""
+        emitted = 0
+        for section, entries in sections:
+            columns = SectionColumns(entries)
+            del entries  # raw entries are not needed anymore
+            if not columns:
+                continue
+            if emitted:
+                yield NextPageTemplate(section)
+                yield PageBreak()
+            emitted += 1
+            yield from self._section_flowables(columns)
 
-    def _add_section(self, elements: list, entries: List[dict]):
+    def _section_flowables(self, columns: SectionColumns) -> Iterator[Flowable]:
         """
         From section group reports by `fenomeno`,
-        sort them and render elements
+        sort them by date and render elements
+
+        Entries come as columns (see `SectionColumns`), so layout only
+        consumes ready-made rows.
 
         :example:
             ```
@@ -207,48 +498,16 @@ class ReportPdf:
             ...
             ```
         """
-        groups = self._group_reports(entries)
-        for fenomeno, reports in groups.items():
-            if not reports:
-                continue
-
+        for fenomeno, strong, rows in columns.groups():
             # Join fenomeno with first report, to better reading
-            _fenomeno, fenomeno_sp = self._add_fenomeno(fenomeno, reports)
-            first_report, first_report_sp = self._add_report(reports[0])
-            elements.append(KeepTogether([
-                _fenomeno, fenomeno_sp, first_report, first_report_sp]))
+            _fenomeno, fenomeno_sp = self._add_fenomeno(fenomeno, strong)
+            first_report, first_report_sp = self._add_report(*rows[0])
+            yield KeepTogether([_fenomeno, fenomeno_sp, first_report, first_report_sp])
 
-            for report in reports[1:]:
-                report, report_sp = self._add_report(report)
-                elements += report, report_sp
+            for date, message in rows[1:]:
+                yield from self._add_report(date, message)
 
-    def _group_reports(self, entries: List[dict]) -> Dict[str, List[dict]]:
-        """
-        From entries, group by "Fenomeno"
-
-        :return:
-            {[fenomeno]: entries}
-        """
-        # group
-        groups: Dict[str, List[dict]] = {}
-        for entry in entries:
-            fenomeno: str = entry.get('fenomeno', 'Outros')
-            if fenomeno in groups:
-                groups[fenomeno].append(entry)
-            else:
-                groups[fenomeno] = [entry]
-
-        # sort
-        group_keys = groups.keys()
-        if "Outros" in group_keys:
-            # 'Outros' is the last group
-            reports = groups['Outros'].copy()
-            del groups['Outros']
-            groups['Outros'] = reports
-
-        return groups
-
-    def _add_fenomeno(self, fenomeno: str, reports: List[dict]):
+    def _add_fenomeno(self, fenomeno: str, strong: bool):
         """
         Add fenomeno to pdf.
 
@@ -259,8 +518,7 @@ class ReportPdf:
             2023-12-30T12:00 Registro de chuva moderada...
             2023-12-31T12:00 Registro de chuva forte...
         """
-        has_forte = ["forte" in r['mensagem'].lower() for r in reports]
-        if any(has_forte):
+        if strong:
             fenomeno_color = colors.red
         else:
             fenomeno_color = colors.HexColor('#555555')
@@ -277,17 +535,15 @@ class ReportPdf:
         fenomeno_table.hAlign = 'LEFT'
         return fenomeno_table, Spacer(1, 6)
 
-    def _add_report(self, report: dict):
+    def _add_report(self, date: str, message: str):
         """
         Add report content.
 
         Example:
-            2023-12-30T12:00 Registro de chuva moderada...
+            30/12/2023 às 12:00 Registro de chuva moderada...
         """
-        data = dt.fromisoformat(report['data']).strftime(r"%d/%m/%Y às %H:%M")
-        mensagem: str = report['mensagem']
         report = Table([[
-            "", Paragraph(f"<b>{data}</b> {mensagem}", self.custom_styles['Description'])]],
+            "", Paragraph(f"<b>{date}</b> {message}", self.custom_styles['Description'])]],
             colWidths=[self._LEFT_MARGIN2, self._INNER_WIDTH],
         )
         spacer = Spacer(1, 6)
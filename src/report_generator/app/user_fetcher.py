@@ -0,0 +1,87 @@
+"""
+user_fetcher.py
+
+Responsability:
+- fetch users from data_service in batches, over a few connections at once
+- merge the batches back in the order of the phones
+"""
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from data_service.app.client import DataServiceClient
+from report_generator.app.utils import get_logger  # pylint: disable=E0401,E0611
+
+
+class UserFetcher:
+    """
+    Users of many phones, fetched in batches over a few connections at once
+
+    Phones are split in batches of `batch_size`, shared among up to
+    `connections` connections. Each connection sends its batches back to
+    back (pipelined framed `get`s) and is closed once answered, so the
+    sync data_service engine serves connections one after the other and
+    the asyncio or pre-fork ones at once. Results are merged in the order
+    of the phones, as a single `get` would return them. A connection that
+    drops is opened again, and its batches sent again, `RETRIES` times.
+
+    Example:
+        ```python
+        users = UserFetcher().get(phones)
+        ```
+    """
+
+    BATCH_SIZE = 2000
+    CONNECTIONS = 4
+    RETRIES = 1
+
+    def __init__(self, host='127.0.0.1', port=5784, batch_size=BATCH_SIZE,
+                 connections=CONNECTIONS, timeout: float = None):
+        self.host = host
+        self.port = port
+        self.batch_size = batch_size
+        self.connections = connections
+        self.timeout = timeout
+        self.logger = get_logger("UserFetcher")
+
+    def get(self, phones: List[str]) -> List[dict]:
+        """Find users by phone"""
+        phones = list(dict.fromkeys(phones))  # a phone in two batches would repeat users
+        batches = [phones[i:i + self.batch_size]
+                   for i in range(0, len(phones), self.batch_size)]
+        # batch indices of each connection
+        shares = [range(i, len(batches), self.connections)
+                  for i in range(min(self.connections, len(batches)))]
+        results: List[List[dict]] = [None] * len(batches)
+
+        def fetch(share: range):
+            for i, users in zip(share, self._get_batches([batches[i] for i in share])):
+                results[i] = users
+
+        if len(shares) == 1:
+            fetch(shares[0])
+        elif shares:
+            with ThreadPoolExecutor(len(shares)) as pool:
+                list(pool.map(fetch, shares))
+        return [user for users in results for user in users]
+
+    def _get_batches(self, batches: List[List[str]]) -> List[List[dict]]:
+        """Users of each batch, over one connection"""
+        messages = [{'command': "get", 'phone': phones} for phones in batches]
+        for attempt in range(self.RETRIES + 1):
+            try:
+                with DataServiceClient(self.host, self.port, self.timeout) as client:
+                    responses = client.pipeline(messages)
+                break
+            except OSError as exc:
+                if attempt == self.RETRIES:
+                    raise
+                self.logger.warning("data_service connection lost (%s), retrying", exc)
+
+        users = []
+        for response in responses:
+            if response.startswith("Error"):
+                raise ValueError(response)
+            users.append(json.loads(response)['data'])
+        return users
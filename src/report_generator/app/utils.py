@@ -1,37 +1,33 @@
-import logging
 import os
 
+# stop_logging re-exported: one set of listeners for both apps
+from data_service.app.utils import (  # pylint: disable=E0401,E0611,W0611
+    get_logger as _get_logger, stop_logging
+)
 
 app_folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 
+LOG_LEVEL_ENV = "REPORT_GENERATOR_LOG_LEVEL"
+"""Environment variable with the default level (e.g. `INFO`), DEBUG if unset"""
+
+LOG_FILE = f"{app_folder}/log/report_generator.log"
+
+
 def get_logger(
         name: str,
-        level=logging.DEBUG,
+        level: int | str = None,
         log_to_file=True,
         log_to_stream=True,
         format_file=True,
         format_stream=True
 ):
-    """Get logger with all needed configs"""
-    logger = logging.getLogger(name)
-    logger.setLevel(level)
-    formatter = logging.Formatter(
-        '%(asctime)s [%(name)s] %(levelname)s - %(message)s')
-
-    if log_to_file:
-        file_handler = logging.FileHandler(
-            f'{app_folder}/log/report_generator.log')
-        if format_file:
-            file_handler.setFormatter(formatter)
-        file_handler.setLevel(level)
-        logger.addHandler(file_handler)
-
-    if log_to_stream:
-        stream_handler = logging.StreamHandler()
-        if format_stream:
-            stream_handler.setFormatter(formatter)
-        stream_handler.setLevel(level)
-        logger.addHandler(stream_handler)
-
-    return logger
+    """
+    Get logger with all needed configs
+
+    The queued logging of data_service, writing to `log/report_generator.log`.
+
+    :param level: defaults to `$REPORT_GENERATOR_LOG_LEVEL` (DEBUG if unset)
+    """
+    return _get_logger(name, level, log_to_file, log_to_stream, format_file,
+                       format_stream, log_file=LOG_FILE, level_env=LOG_LEVEL_ENV)
@@ -0,0 +1,63 @@
+"""Test columns.py"""
+import unittest
+
+from report_generator.app.columns import SectionColumns  # pylint: disable=E0401
+
+
+class TestSectionColumns(unittest.TestCase):
+    """Test columns.py"""
+
+    def setUp(self):
+        self.entries = [
+            {'data': "2024-01-02T10:00", 'mensagem': "vento 1"},
+            {'fenomeno': "chuva", 'data': "2024-01-03T12:00", 'mensagem': "chuva 1"},
+            {'fenomeno': "vento", 'data': "2024-01-01T08:00", 'mensagem': "vento 2"},
+            {'fenomeno': "chuva", 'data': "2024-01-01T12:00", 'mensagem': "Chuva FORTE"},
+            {'fenomeno': "chuva", 'data': "2024-01-03T12:00", 'mensagem': "chuva 2"},
+        ]
+
+    def test_columns(self):
+        """Every entry must have its columns, in file order"""
+        # act
+        columns = SectionColumns(self.entries)
+
+        # assert
+        self.assertEqual(len(columns), 5)
+        self.assertEqual(columns.fenomenos, ["Outros", "chuva", "vento"])
+        self.assertEqual(list(columns.codes), [0, 1, 2, 1, 1])
+        self.assertEqual(list(columns.strong), [0, 0, 0, 1, 0])
+        self.assertEqual(columns.dates[1], "03/01/2024 às 12:00")
+        self.assertIs(columns.dates[1], columns.dates[4])  # formatted once
+        self.assertLess(columns.timestamps[2], columns.timestamps[0])
+
+    def test_groups(self):
+        """Groups must keep their order, 'Outros' last, rows sorted by date"""
+        # act
+        groups = list(SectionColumns(self.entries).groups())
+
+        # assert
+        self.assertEqual([(fenomeno, strong) for fenomeno, strong, _ in groups],
+                         [("chuva", True), ("vento", False), ("Outros", False)])
+        self.assertEqual([[message for _, message in rows] for _, _, rows in groups],
+                         [["Chuva FORTE", "chuva 1", "chuva 2"], ["vento 2"], ["vento 1"]])
+        self.assertEqual(list(SectionColumns([]).groups()), [])
+
+    def test_offset_dates(self):
+        """Dates with an offset must be shown as written and sorted by instant"""
+        # arrange
+        entries = [
+            {'data': "2024-01-02T10:00-03:00", 'mensagem': "13h UTC"},
+            {'data': "2024-01-02T12:00+00:00", 'mensagem': "12h UTC"},
+        ]
+
+        # act
+        columns = SectionColumns(entries)
+
+        # assert
+        self.assertEqual(columns.dates[0], "02/01/2024 às 10:00")
+        _, _, rows = next(columns.groups())
+        self.assertEqual([message for _, message in rows], ["12h UTC", "13h UTC"])
+
+
+if __name__ == '__main__':
+    unittest.main()
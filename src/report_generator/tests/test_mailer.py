@@ -0,0 +1,61 @@
+"""Test mailer.py"""
+import smtplib
+import unittest
+from unittest.mock import patch
+
+from report_generator.app.mailer import ReportMailer  # pylint: disable=E0401
+
+
+class TestReportMailer(unittest.TestCase):
+    """Test mailer.py"""
+
+    def setUp(self):
+        self.mailer = ReportMailer("localhost", 1025, "origem@exemplo.com")
+
+    def tearDown(self):
+        self.mailer.close()
+
+    @patch("report_generator.app.mailer.smtplib.SMTP")
+    def test_session_reused(self, smtp_class):
+        """Every email must go through the same SMTP session"""
+        # act
+        for i in range(3):
+            self.mailer.send(f"user{i}@nimbusmeteorologia.com.br", b"%PDF")
+
+        # assert
+        smtp_class.assert_called_once()
+        messages = [c.args[0] for c in smtp_class.return_value.send_message.call_args_list]
+        self.assertEqual([m['To'] for m in messages], [
+            f"user{i}@nimbusmeteorologia.com.br" for i in range(3)])
+        attachment = next(messages[0].iter_attachments())
+        self.assertEqual(attachment.get_content(), b"%PDF")
+
+    @patch("report_generator.app.mailer.smtplib.SMTP")
+    def test_reconnect(self, smtp_class):
+        """A dropped session must be opened again and the email retried"""
+        # arrange
+        smtp_class.return_value.send_message.side_effect = [
+            None, smtplib.SMTPServerDisconnected(), None]
+
+        # act
+        self.mailer.send("joao@nimbusmeteorologia.com.br", b"%PDF")
+        self.mailer.send("maria@nimbusmeteorologia.com.br", b"%PDF")
+
+        # assert
+        self.assertEqual(smtp_class.call_count, 2)
+        self.assertEqual(smtp_class.return_value.send_message.call_count, 3)
+
+    @patch("report_generator.app.mailer.smtplib.SMTP")
+    def test_rejected_not_retried(self, smtp_class):
+        """A rejected email must raise without reconnecting"""
+        # arrange
+        smtp_class.return_value.send_message.side_effect = smtplib.SMTPRecipientsRefused({})
+
+        # act / assert
+        with self.assertRaises(smtplib.SMTPRecipientsRefused):
+            self.mailer.send("joao@nimbusmeteorologia.com.br", b"%PDF")
+        smtp_class.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+"""Test pdf_cache.py"""
+import os
+import tempfile
+import unittest
+from datetime import datetime
+
+from report_generator.app.pdf_cache import PdfCache, raw_digest  # pylint: disable=E0401
+from report_generator.app.raw_data import RawSections  # pylint: disable=E0401
+
+up = os.path.dirname
+
+src_folder = up(up(up(__file__)))
+arquivo_bruto = f"{src_folder}/report_generator/tests/data/arquivo_bruto.json"
+
+
+class TestPdfCache(unittest.TestCase):
+    """Test pdf_cache.py"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()  # pylint: disable=R1732
+        self.date = datetime(2024, 2, 2, 10, 12)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_key(self):
+        """Any change of content must change the key"""
+        # act
+        keys = {
+            PdfCache.key("a", "joao", self.date, 1),
+            PdfCache.key("b", "joao", self.date, 1),
+            PdfCache.key("a", "maria", self.date, 1),
+            PdfCache.key("a", "joao", datetime(2024, 2, 2, 10, 13), 1),
+            PdfCache.key("a", "joao", self.date, 2),
+        }
+
+        # assert
+        self.assertEqual(len(keys), 5)
+        self.assertIn(PdfCache.key("a", "joao", self.date, 1), keys)
+        self.assertNotEqual(raw_digest({'análise': []}), raw_digest({'previsao': []}))
+        self.assertEqual(len(raw_digest(RawSections(arquivo_bruto))), 64)
+
+    def test_evict_least_recently_used(self):
+        """Past max_size, the least recently read entries must go"""
+        # arrange
+        cache = PdfCache(f"{self.temp_dir.name}/cache", 3500)
+        for i in range(3):
+            cache.put(f"key{i}", b"x" * 1000)
+            os.utime(cache._path(f"key{i}"), (i, i))  # pylint: disable=W0212
+        cache.get("key0")  # now the most recent
+
+        # act
+        cache.put("key3", b"x" * 1000)
+
+        # assert
+        self.assertEqual([cache.contains(f"key{i}") for i in range(4)],
+                         [True, False, True, True])
+        self.assertIsNone(cache.get("key1"))
+        self.assertEqual(cache.get("key3"), b"x" * 1000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+"""Test raw_data.py"""
+import json
+import os
+import tempfile
+import tracemalloc
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+from PyPDF2 import PdfReader  # pylint: disable=E0401
+
+from report_generator.app.raw_data import RawSections, iter_raw_sections  # pylint: disable=E0401
+from report_generator.app.report_pdf import ReportPdf  # pylint: disable=E0401
+
+up = os.path.dirname
+
+src_folder = up(up(up(__file__)))
+arquivo_bruto = f"{src_folder}/report_generator/tests/data/arquivo_bruto.json"
+
+
+class TestRawData(unittest.TestCase):
+    """Test raw_data.py"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()  # pylint: disable=R1732
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _write(self, data: dict) -> str:
+        path = f"{self.temp_dir.name}/bruto.json"
+        with open(path, 'w', encoding='utf8') as f:
+            json.dump(data, f, indent=4, ensure_ascii=False)
+        return path
+
+    @patch("report_generator.app.raw_data.CHUNK_SIZE", 7)
+    def test_same_as_json_load(self):
+        """Sections must match json.load, whatever the chunk boundaries"""
+        # arrange
+        with open(arquivo_bruto, 'r', encoding='utf8') as f:
+            expected = json.load(f)
+
+        # act
+        sections = list(iter_raw_sections(arquivo_bruto))
+
+        # assert
+        self.assertEqual(sections, list(expected.items()))
+
+    def test_memory_bounded_by_section(self):
+        """Reading section by section must not hold the whole file"""
+        # arrange
+        entry = {'fenomeno': "chuva", 'data': "2024-01-01T00:00", 'mensagem': "x" * 200}
+        path = self._write({f"section{i}": [entry] * 3000 for i in range(16)})
+
+        # act
+        tracemalloc.start()
+        with open(path, 'r', encoding='utf8') as f:
+            json.load(f)
+        full = tracemalloc.get_traced_memory()[1]
+        tracemalloc.reset_peak()
+        for _ in iter_raw_sections(path):
+            pass
+        streamed = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        # assert
+        self.assertLess(streamed, full / 4)
+
+    def test_report_from_raw_sections(self):
+        """ReportPdf must render the same pages from a RawSections"""
+        # arrange
+        with open(arquivo_bruto, 'r', encoding='utf8') as f:
+            data = json.load(f)
+        # sections out of business order
+        path = self._write(dict(reversed(data.items())))
+        date = datetime(2024, 2, 2, 10, 12)
+
+        # act
+        expected = ReportPdf(data, 'joao', date).generate_pdf(f"{self.temp_dir.name}/a.pdf")
+        streamed = ReportPdf(RawSections(path), 'joao', date).generate_pdf(
+            f"{self.temp_dir.name}/b.pdf")
+
+        # assert
+        self.assertEqual(
+            [page.extract_text() for page in PdfReader(streamed).pages],
+            [page.extract_text() for page in PdfReader(expected).pages])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,8 @@
 """Test data_service.py"""
+import argparse
+import json
 import os
+import tempfile
 import threading
 import unittest
 from time import sleep
@@ -8,6 +11,7 @@ from unittest.mock import patch
 
 from data_service.app.data_service import DataService
 from report_generator.app.report_args import ReportArgs  # pylint: disable=E0401
+from report_generator.app.user_fetcher import UserFetcher  # pylint: disable=E0401
 
 up = os.path.dirname
 
@@ -41,10 +45,10 @@ class TestArgs(unittest.TestCase):
         self.server = DataService(test=True)
         self.server_thread = threading.Thread(target=self.server.start_server)
         self.server_thread.start()
+        sleep(0.1)
 
         self.host = '127.0.0.1'
         self.port = 5784
-        sleep(0.01)
 
         if os.path.exists(csv_file):
             os.remove(csv_file)
@@ -67,6 +71,74 @@ class TestArgs(unittest.TestCase):
         args.parse_args()
         self.assertEqual(len(args.users), 2)
 
+    @patch("builtins.open", mock_open)
+    def test_manifest(self):
+        """Every manifest job must get its users, sharing identical raw files"""
+        # arrange
+        jobs = [
+            {'telefone': "21934567891,21934567892", 'data': "2024-02-02 10:12",
+             'bruto': arquivo_bruto},
+            {'telefone': "21934567893,21934567891", 'data': "2024-02-03 10:12",
+             'bruto': f"{src_folder}/report_generator/../report_generator/tests/"
+                      "data/arquivo_bruto.json",
+             'envia_email': True},
+        ]
+        with tempfile.TemporaryDirectory() as temp_dir:
+            manifest = f"{temp_dir}/jobs.jsonl"
+            with open(manifest, 'w', encoding='utf8') as f:
+                f.write("\n".join(json.dumps(job) for job in jobs) + "\n")
+
+            # act
+            with patch('argparse._sys.argv', [data_svc_main, '--manifest', manifest]):
+                args = ReportArgs(True)
+                args.parse_args()
+
+        # assert
+        self.assertEqual(len(args.report_jobs), 2)
+        first, second = args.report_jobs
+        self.assertEqual([u['name'] for u in first.users], ['joao', 'maria'])
+        self.assertEqual([u['name'] for u in second.users], ['jose', 'joao'])
+        self.assertIs(first.json_data, second.json_data)
+        self.assertEqual((first.send_email, second.send_email, args.send_email),
+                         (False, True, True))
+
+    @patch('argparse._sys.argv', [data_svc_main, '--manifest', arquivo_bruto])
+    def test_manifest_invalid_line(self):
+        """An invalid manifest line must be reported with its number"""
+        # act / assert
+        with self.assertRaisesRegex(argparse.ArgumentTypeError, "--manifest linha 1"):
+            ReportArgs(True).parse_args()
+
+    @patch("builtins.open", mock_open)
+    def test_user_fetcher(self):
+        """Batches over many connections must be merged in the order of the phones"""
+        # arrange
+        phones = ["21934567893", "21934567891", "00000000000", "21934567892", "21934567893"]
+
+        # act
+        users = UserFetcher(batch_size=1, connections=2).get(phones)
+        empty = UserFetcher().get([])
+
+        # assert
+        self.assertEqual([u['name'] for u in users], ['jose', 'joao', 'maria'])
+        self.assertEqual(empty, [])
+
+    @patch('argparse._sys.argv', [data_svc_main, '--daemon', '--profile'])
+    def test_daemon_profile(self):
+        """Daemon jobs must be timed by the daemon's profiler"""
+        # act
+        args = ReportArgs(True)
+        args.parse_args()
+        job = args.parse_job({'telefone': "21934567891", 'data': "2024-02-02 10:12",
+                              'bruto': arquivo_bruto}, {})
+
+        # assert
+        self.assertTrue(args.profiler.enabled)
+        self.assertIs(job.profiler, args.profiler)
+        with patch('argparse._sys.argv', [data_svc_main, '--daemon', '--cprofile', "run.prof"]):
+            with self.assertRaisesRegex(argparse.ArgumentTypeError, "--cprofile"):
+                ReportArgs(True).parse_args()
+
 
 if __name__ == '__main__':
     unittest.main()
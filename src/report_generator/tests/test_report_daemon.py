@@ -0,0 +1,117 @@
+"""Test report_daemon.py"""
+import os
+import socket
+import threading
+import unittest
+from time import sleep
+from typing import List
+
+from report_generator.app.report_args import ReportArgs  # pylint: disable=E0401
+from report_generator.app.report_daemon import ReportDaemon, request_report  # pylint: disable=E0401
+from report_generator.app.report_generator import ReportGenerator  # pylint: disable=E0401
+
+up = os.path.dirname
+
+src_folder = up(up(up(__file__)))
+arquivo_bruto = f"{src_folder}/report_generator/tests/data/arquivo_bruto.json"
+
+PORT = 5787
+USERS = {
+    "21934567891": {'name': 'joao', 'email': 'joao@nimbusmeteorologia.com.br'},
+    "21934567892": {'name': 'maria', 'email': 'maria@nimbusmeteorologia.com.br'},
+}
+
+
+class UsersClient:
+    """data_service client answering from `USERS`"""
+
+    def __init__(self):
+        self.requests = 0
+
+    def get(self, phones: List[str]) -> List[dict]:
+        """Find users by phone"""
+        self.requests += 1
+        return [USERS[phone] for phone in phones if phone in USERS]
+
+
+class TestReportDaemon(unittest.TestCase):
+    """Test report_daemon.py"""
+
+    def setUp(self):
+        report = ReportGenerator(True)
+        report.args = ReportArgs(True)
+        report.args.jobs = 2
+        report.args.senders = 1
+        report.args.stamp = False
+        report.args.config = {'mail_host': "localhost", 'mail_port': 1025}
+        report.args.origin_email = ""
+        self.users = UsersClient()
+        self.daemon = ReportDaemon(report, port=PORT, data_service=self.users)
+        self.daemon_thread = threading.Thread(target=self.daemon.start_server)
+        self.daemon_thread.start()
+        self.assertTrue(self.daemon.ready.wait(30))
+        self.generated = f"{src_folder}/report_generator/generated"
+
+    def tearDown(self):
+        self.daemon.stop_server()
+        self.daemon_thread.join()
+
+    def test_concurrent_jobs(self):
+        """Concurrent jobs must all be rendered, to distinct files"""
+        # arrange
+        jobs = [
+            {'telefone': "21934567891,21934567892", 'data': "2024-02-02 10:12",
+             'bruto': arquivo_bruto},
+            {'telefone': "21934567892", 'data': "2024-02-03 10:12", 'bruto': arquivo_bruto},
+            {'telefone': "21934567891", 'data': "2024-02-04 10:12", 'bruto': arquivo_bruto},
+        ]
+        summaries = [None] * len(jobs)
+
+        def send(i: int):
+            summaries[i] = request_report(jobs[i], port=PORT, timeout=60)
+
+        # act
+        threads = [threading.Thread(target=send, args=(i,)) for i in range(len(jobs))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # assert
+        self.assertEqual([s['generated'] for s in summaries], [2, 1, 1])
+        self.assertEqual([s['errors'] for s in summaries], [[], [], []])
+        self.assertEqual(len(os.listdir(self.generated)), 4)
+        self.assertEqual(self.users.requests, 3)
+        self.assertEqual(len(self.daemon._raw_data), 1)  # pylint: disable=W0212
+
+    def test_invalid_job(self):
+        """An invalid job must be refused, leaving the daemon up"""
+        # act / assert
+        with self.assertRaisesRegex(ValueError, "^Error: O telefone"):
+            request_report({'telefone': "123", 'data': "2024-02-02 10:12",
+                            'bruto': arquivo_bruto}, port=PORT, timeout=60)
+        with self.assertRaisesRegex(ValueError, "email_origem"):
+            request_report({'telefone': "21934567891", 'data': "2024-02-02 10:12",
+                            'bruto': arquivo_bruto, 'envia_email': True},
+                           port=PORT, timeout=60)
+        summary = request_report({'telefone': "21934567891", 'data': "2024-02-02 10:12",
+                                  'bruto': arquivo_bruto}, port=PORT, timeout=60)
+        self.assertEqual(summary['generated'], 1)
+
+    def test_silent_client(self):
+        """A client that never sends its job must not keep the daemon up"""
+        # arrange
+        self.daemon.REQUEST_TIMEOUT = 0.2
+        with socket.create_connection(('127.0.0.1', PORT)):
+            sleep(0.5)
+
+            # act
+            self.daemon.stop_server()
+            self.daemon_thread.join(5)
+
+        # assert
+        self.assertFalse(self.daemon_thread.is_alive())
+
+
+if __name__ == '__main__':
+    unittest.main()
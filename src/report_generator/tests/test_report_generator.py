@@ -0,0 +1,293 @@
+"""Test report_generator.py"""
+import json
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from unittest.mock import patch
+
+from PyPDF2 import PdfReader  # pylint: disable=E0401
+
+from report_generator.app.profiler import Profiler  # pylint: disable=E0401
+from report_generator.app.report_args import ReportArgs  # pylint: disable=E0401
+from report_generator.app import report_generator  # pylint: disable=E0401
+from report_generator.app.report_generator import ReportGenerator  # pylint: disable=E0401
+from report_generator.app.report_pdf import ReportPdf  # pylint: disable=E0401
+
+up = os.path.dirname
+
+src_folder = up(up(up(__file__)))
+arquivo_bruto = f"{src_folder}/report_generator/tests/data/arquivo_bruto.json"
+
+
+class TestReportGenerator(unittest.TestCase):
+    """Test report_generator.py"""
+
+    def setUp(self):
+        with open(arquivo_bruto, 'r', encoding='utf8') as f:
+            json_data = json.load(f)
+
+        self.args = ReportArgs(True)
+        self.args.json_data = json_data
+        self.args.date = datetime(2024, 2, 2, 10, 12)
+        self.args.send_email = False
+        self.args.stamp = False
+        self.args.senders = 1
+        self.args.users = [
+            {'name': 'joao', 'email': 'joao@nimbusmeteorologia.com.br'},
+            {'name': 'joao', 'email': 'joao@nimbusmeteorologia2.com.br'},
+            {'name': 'maria', 'email': 'maria@nimbusmeteorologia.com.br'},
+        ]
+        self.report = ReportGenerator(True)
+        self.report.args = self.args
+        self.generated = f"{src_folder}/report_generator/generated"
+
+    def _generate(self, jobs: int) -> list:
+        self.args.jobs = jobs
+        self.summary = self.report.generate_pdf()
+        self.assertEqual(self.summary['generated'], 3)
+        self.assertEqual(self.summary['errors'], [])
+        return sorted(os.listdir(self.generated))
+
+    def test_parallel_filenames(self):
+        """Parallel rendering must produce the same, distinct files"""
+        # act
+        serial = self._generate(1)
+        self.report._init_folders()  # pylint: disable=W0212
+        parallel = self._generate(2)
+
+        # assert
+        self.assertEqual(serial, parallel)
+        self.assertEqual(serial, [
+            '20240202_1012 00000 joao.pdf',
+            '20240202_1012 00001 joao.pdf',
+            '20240202_1012 00002 maria.pdf',
+        ])
+
+    def test_kept_executor(self):
+        """A kept pool must get the report data once per worker, not per PDF"""
+        # arrange
+        report_generator._keyed_jobs.clear()  # pylint: disable=W0212
+        self.args.jobs = 1
+        sent = []
+
+        class Executor(ThreadPoolExecutor):
+            """Pool recording the report data sent along"""
+
+            def submit(self, fn, /, *args, **kwargs):
+                sent.append(args[1])
+                return super().submit(fn, *args, **kwargs)
+
+        # act
+        with Executor(1) as executor:
+            first = self.report.run(self.args, executor)
+            second = self.report.run(self.args, executor, 3)
+
+        # assert
+        self.assertEqual((first['generated'], second['generated']), (3, 3))
+        self.assertEqual(first['errors'] + second['errors'], [])
+        self.assertEqual(len(sent), 8)  # 2 tasks missed it, then were sent again
+        self.assertEqual(len([job for job in sent if job is not None]), 2)
+
+    def test_manifest_jobs(self):
+        """Manifest jobs must render in one run, with their own dates"""
+        # arrange
+        second = ReportArgs(True)
+        second.json_data = self.args.json_data
+        second.date = datetime(2024, 2, 3, 8, 0)
+        second.send_email = False
+        second.users = self.args.users[2:]
+        self.args.manifest_jobs = [self.args, second]
+        self.args.jobs = 2
+
+        # act
+        summary = self.report.generate_pdf()
+
+        # assert
+        self.assertEqual(summary['generated'], 4)
+        self.assertEqual(sorted(os.listdir(self.generated)), [
+            '20240202_1012 00000 joao.pdf',
+            '20240202_1012 00001 joao.pdf',
+            '20240202_1012 00002 maria.pdf',
+            '20240203_0800 00003 maria.pdf',
+        ])
+
+    def test_errors_summary(self):
+        """A failing client must be reported without stopping the others"""
+        # arrange
+        self.args.jobs = 2
+        self.args.users[1] = {'name': '<b>joao', 'email': 'none@nimbusmeteorologia.com.br'}
+
+        # act
+        summary = self.report.generate_pdf()
+
+        # assert
+        self.assertEqual(summary['generated'], 2)
+        self.assertEqual(len(summary['errors']), 1)
+        self.assertEqual(summary['errors'][0]['email'], 'none@nimbusmeteorologia.com.br')
+        self.assertEqual(summary['errors'][0]['stage'], 'pdf')
+
+    def test_stamp(self):
+        """Stamped PDFs must have the body pages and each client's header"""
+        # arrange
+        self.args.stamp = True
+        self.args.users[2]['name'] = 'maria ' * 20  # too long: full render
+
+        # act
+        files = self._generate(2)
+
+        # assert
+        texts = []
+        for file in files:
+            reader = PdfReader(f"{self.generated}/{file}")
+            texts.append([page.extract_text() for page in reader.pages])
+        self.assertEqual(len({len(pages) for pages in texts}), 1)
+        for pages, user in zip(texts, self.args.users):
+            for text in pages:
+                self.assertIn(user['name'].split()[0], text)
+                self.assertIn("Relatório Meteorológico", text)
+
+    def test_profile(self):
+        """Profiled runs must report every stage, per user, as JSON"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # arrange
+            report_path = f"{temp_dir}/profile.json"
+            self.args.profiler = Profiler(True, report_path, f"{temp_dir}/run.prof")
+            self.args.stamp = True
+
+            # act
+            self._generate(2)
+
+            # assert
+            with open(report_path, 'r', encoding='utf8') as f:
+                report = json.load(f)
+            self.assertTrue(os.path.exists(f"{temp_dir}/run.prof"))
+        self.assertEqual({name: stage['calls'] for name, stage in report['stages'].items()},
+                         {'body': 1, 'stamp': 3, 'write': 3})
+        self.assertCountEqual([(u['job'], u['email']) for u in report['users']],
+                         [(0, user['email']) for user in self.args.users])
+        for user in report['users']:
+            self.assertEqual(set(user['stages']), {'stamp', 'write'})
+            self.assertGreater(user['stages']['stamp']['cpu'], 0)
+        self.assertGreater(report['wall'], 0)
+
+    def test_cache(self):
+        """A second run must take every PDF from the cache, without rendering"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # arrange
+            self.report.cache_folder = temp_dir
+            self.args.cache_size = 1024 * 1024
+            self.args.stamp = True
+            first = {}
+            for file in self._generate(2):
+                with open(f"{self.generated}/{file}", 'rb') as f:
+                    first[file] = f.read()
+            self.assertEqual(self.summary['cached'], 0)
+            self.args.profiler = Profiler(True)
+
+            # act
+            files = self._generate(2)
+
+            # assert
+            self.assertEqual(self.summary['cached'], 3)
+            self.assertEqual(set(self.args.profiler.report()['stages']), {'cache', 'write'})
+            for file in files:
+                with open(f"{self.generated}/{file}", 'rb') as f:
+                    self.assertEqual(f.read(), first[file])
+
+            # a new name is rendered
+            self.args.users[2]['name'] = 'mariana'
+            self._generate(2)
+            self.assertEqual(self.summary['cached'], 2)
+
+    def test_section_headers(self):
+        """Every page must have the header of its own section, no temp file"""
+        # arrange
+        pdf = ReportPdf(self.args.json_data, 'joao', self.args.date)
+
+        # act
+        filename = pdf.generate_pdf(f"{self.generated}/sections.pdf")
+
+        # assert
+        sections = [
+            [section in page.extract_text() for section in ("Análise", "Previsão")]
+            for page in PdfReader(filename).pages
+        ]
+        self.assertEqual(sections, [[True, False]] * 2 + [[False, True]] * 2)
+        self.assertFalse(os.path.exists("$.temp.pdf"))
+
+    def test_empty_section(self):
+        """An empty section must get no page, the next one taking the first page"""
+        # arrange
+        json_data = dict(self.args.json_data)
+        json_data[next(iter(json_data))] = []
+        pdf = ReportPdf(json_data, 'joao', self.args.date)
+
+        # act
+        filename = pdf.generate_pdf(f"{self.generated}/sections.pdf")
+
+        # assert
+        sections = [
+            [section in page.extract_text() for section in ("Análise", "Previsão")]
+            for page in PdfReader(filename).pages
+        ]
+        self.assertEqual(sections, [[False, True]] * 2)
+
+    @patch("report_generator.app.mailer.smtplib.SMTP")
+    def test_send_email(self, smtp_class):
+        """Rendered PDFs must be emailed from memory, one SMTP session per sender"""
+        # arrange
+        self.args.send_email = True
+        self.args.config = {'mail_host': "localhost", 'mail_port': 1025}
+        self.args.origin_email = "origem@exemplo.com"
+        self.args.senders = 2
+        # created lazily, so two senders could each get their own
+        send_message = smtp_class.return_value.send_message
+
+        # act
+        files = self._generate(2)
+
+        # assert
+        self.assertEqual(self.summary['delivered'], 3)
+        self.assertLessEqual(smtp_class.call_count, 2)
+        messages = [c.args[0] for c in send_message.call_args_list]
+        self.assertCountEqual([m['To'] for m in messages],
+                              [user['email'] for user in self.args.users])
+        pdfs = []
+        for file in files:
+            with open(f"{self.generated}/{file}", 'rb') as f:
+                pdfs.append(f.read())
+        for message in messages:
+            self.assertIn(next(message.iter_attachments()).get_content(), pdfs)
+
+    @patch("report_generator.app.mailer.smtplib.SMTP")
+    def test_failing_senders(self, smtp_class):
+        """Failing senders must fail every email without stalling rendering"""
+        # arrange
+        smtp_class.side_effect = ConnectionRefusedError("connection refused")
+        self.args.send_email = True
+        self.args.stamp = True
+        self.args.jobs = 1
+        self.args.origin_email = "origem@exemplo.com"
+        self.args.users = [
+            {'name': f'cliente{i}', 'email': f'cliente{i}@nimbusmeteorologia.com.br'}
+            for i in range(ReportGenerator.OUTBOX_SIZE + 4)
+        ]
+
+        for config in ({'mail_host': "localhost", 'mail_port': 1025}, {}):
+            with self.subTest(config=config):
+                self.args.config = config
+
+                # act
+                summary = self.report.run(self.args)
+
+                # assert
+                self.assertEqual(summary['generated'], len(self.args.users))
+                self.assertEqual(summary['delivered'], 0)
+                self.assertEqual(len(summary['errors']), len(self.args.users))
+                self.assertEqual({e['stage'] for e in summary['errors']}, {"email"})
+
+
+if __name__ == '__main__':
+    unittest.main()
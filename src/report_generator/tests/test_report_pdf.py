@@ -0,0 +1,48 @@
+"""Test report pdf"""
+import io
+import unittest
+
+from reportlab.platypus import SimpleDocTemplate
+from reportlab.platypus.flowables import Flowable
+
+from report_generator.app.report_pdf import LazyFlowables  # pylint: disable=E0401
+
+
+class _Line(Flowable):
+    """Flowable that counts how many were drawn"""
+
+    drawn = 0
+
+    def wrap(self, availWidth, availHeight):
+        return availWidth, 40
+
+    def draw(self):
+        _Line.drawn += 1
+
+
+class TestReportPdf(unittest.TestCase):
+    """Test report pdf"""
+
+    def test_lazy_flowables(self):
+        """Story must be produced as it is laid out, a batch ahead at most"""
+        # arrange
+        _Line.drawn = 0
+        ahead = []
+
+        def story():
+            for i in range(2000):
+                ahead.append(i - _Line.drawn)
+                yield _Line()
+
+        # act
+        doc = SimpleDocTemplate(io.BytesIO())
+        doc.build(LazyFlowables(story(), batch=16))
+
+        # assert
+        self.assertEqual(_Line.drawn, 2000)
+        self.assertEqual(len(ahead), 2000)
+        self.assertLessEqual(max(ahead), 2 * 16)
+
+
+if __name__ == '__main__':
+    unittest.main()